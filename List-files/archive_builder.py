@@ -0,0 +1,322 @@
+"""
+Archive writers used by list-actions.py.
+
+Zip archives are built in two steps: prepare_members() runs in a process pool
+and deflates batches of files (raw deflate, as zip stores it) and computes their CRC-32;
+ZipWriter then appends the finished members to the archive in whatever order
+they complete and writes the central directory at the end. Zip64 records are
+used only where a size, offset or count needs them.
+
+Tar archives are written as a stream and compressed by the zstd or xz command
+line tool with all cores (-T0), or by the lzma module if xz is not installed.
+"""
+import collections
+import os
+import shutil
+import struct
+import subprocess
+import tarfile
+import tempfile
+import time
+import zlib
+
+DEFLATE_LEVEL = 6
+READ_BLOCK_SIZE = 1024 * 1024
+SPOOL_THRESHOLD = 4 * 1024 * 1024  # compressed members larger than this go through a temporary file
+BATCH_FILES = 64  # small files are sent to the pool in batches of up to this many files
+BATCH_BYTES = 4 * 1024 * 1024  # or of this many bytes
+
+# Already compressed formats: deflating them costs CPU and saves next to nothing
+INCOMPRESSIBLE_EXTENSIONS = {
+    ".7z", ".apk", ".avi", ".br", ".bz2", ".docx", ".epub", ".flac", ".gif", ".gz", ".heic", ".jar", ".jpeg", ".jpg",
+    ".lz4", ".lzma", ".m4a", ".m4v", ".mkv", ".mov", ".mp3", ".mp4", ".odt", ".ods", ".ogg", ".opus", ".png", ".pptx",
+    ".rar", ".tgz", ".webm", ".webp", ".xlsx", ".xz", ".zip", ".zst",
+}
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_COUNT_LIMIT = 0xFFFF
+UTF8_NAME_FLAG = 0x800
+VERSION_DEFAULT = 20
+VERSION_ZIP64 = 45
+MADE_BY_UNIX = 3 << 8
+
+LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+CENTRAL_HEADER = struct.Struct("<4sHHHHHHIIIHHHHHII")
+ZIP64_END = struct.Struct("<4sQHHIIQQQQ")
+ZIP64_LOCATOR = struct.Struct("<4sIQI")
+END_OF_CENTRAL_DIRECTORY = struct.Struct("<4sHHHHIIH")
+
+# A file ready to be appended: data holds small compressed members, spool_file larger ones,
+# and stored members (data and spool_file both None) are copied from path
+Member = collections.namedtuple("Member", "path name size mtime mode method crc compressed_size data spool_file")
+
+TAR_COMPRESSIONS = {"zst": "zstd", "xz": "xz"}  # archive suffix -> command line tool
+
+
+def batch_paths(file_paths):
+    """
+    Group paths into lists of up to BATCH_FILES files or BATCH_BYTES bytes,
+    so tiny files do not cost one round trip to a pool process each.
+    """
+    batch, batch_bytes = [], 0
+    for path in file_paths:
+        batch.append(path)
+        try:
+            batch_bytes += os.stat(path).st_size
+        except OSError:
+            pass
+        if len(batch) >= BATCH_FILES or batch_bytes >= BATCH_BYTES:
+            yield batch
+            batch, batch_bytes = [], 0
+    if batch:
+        yield batch
+
+
+def prepare_members(task):
+    """
+    Process pool entry point: prepare a batch of files and return a
+    (path, Member or None, error) tuple for each.
+    """
+    paths, spool_dir = task
+    results = []
+    for path in paths:
+        try:
+            results.append((path, prepare_member(path, spool_dir), None))
+        except OSError as e:
+            results.append((path, None, e))
+    return results
+
+
+def prepare_member(path, spool_dir):
+    """
+    Deflate one file and return its Member, or None if the file does not
+    exist. Files of INCOMPRESSIBLE_EXTENSIONS, and files deflate does not
+    make smaller, are only checksummed and stored as they are.
+    """
+    try:
+        source = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    with source:
+        st = os.fstat(source.fileno())
+        name = os.path.basename(path)
+        crc, size = 0, 0
+        if os.path.splitext(name)[1].lower() in INCOMPRESSIBLE_EXTENSIONS:
+            for block in iter(lambda: source.read(READ_BLOCK_SIZE), b''):
+                crc = zlib.crc32(block, crc)
+                size += len(block)
+            return Member(path, name, size, st.st_mtime, st.st_mode, ZIP_STORED, crc, size, None, None)
+
+        compressor = zlib.compressobj(DEFLATE_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)
+        chunks, compressed_size, spool = [], 0, None
+        try:
+            for block in iter(lambda: source.read(READ_BLOCK_SIZE), b''):
+                crc = zlib.crc32(block, crc)
+                size += len(block)
+                chunk = compressor.compress(block)
+                compressed_size += len(chunk)
+                chunks.append(chunk)
+                if spool is None and compressed_size > SPOOL_THRESHOLD:
+                    spool = tempfile.NamedTemporaryFile(dir=spool_dir, delete=False)
+                if spool is not None:
+                    spool.writelines(chunks)
+                    chunks.clear()
+            chunk = compressor.flush()
+            compressed_size += len(chunk)
+            chunks.append(chunk)
+            if spool is not None:
+                spool.writelines(chunks)
+                spool.close()
+        except BaseException:
+            if spool is not None:
+                spool.close()
+                os.unlink(spool.name)
+            raise
+    if compressed_size >= size:
+        if spool is not None:
+            os.unlink(spool.name)
+        return Member(path, name, size, st.st_mtime, st.st_mode, ZIP_STORED, crc, size, None, None)
+    return Member(path, name, size, st.st_mtime, st.st_mode, ZIP_DEFLATED, crc, compressed_size,
+                  None if spool else b''.join(chunks), spool.name if spool else None)
+
+
+def dos_date_time(timestamp):
+    """Return the (date, time) words zip uses for a timestamp, clamped to the years zip can store."""
+    t = time.localtime(timestamp)
+    if t.tm_year < 1980:
+        return (1 << 5) | 1, 0
+    if t.tm_year > 2107:
+        return (127 << 9) | (12 << 5) | 31, (23 << 11) | (59 << 5) | 29
+    return ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday, (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+
+
+def encode_name(name):
+    """Encode a member name, flagging UTF-8 names; undecodable names keep their raw bytes."""
+    try:
+        encoded = name.encode('utf-8')
+    except UnicodeEncodeError:
+        return os.fsencode(name), 0
+    return encoded, 0 if encoded.isascii() else UTF8_NAME_FLAG
+
+
+class ZipWriter:
+    """
+    Append finished members to a new zip file. Member data is written with
+    os-level calls so spooled and stored members can be copied inside the
+    kernel; headers are collected in a buffer between those copies.
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.fd = os.open(file_name, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+        self.offset = 0
+        self.central_directory = []
+        self._buffer = bytearray()
+
+    def _write(self, data):
+        self._buffer += data
+        self.offset += len(data)
+        if len(self._buffer) >= READ_BLOCK_SIZE:
+            self._flush()
+
+    def _flush(self):
+        written = 0
+        while written < len(self._buffer):
+            written += os.write(self.fd, memoryview(self._buffer)[written:])
+        self._buffer.clear()
+
+    def _append_file(self, path, size):
+        """Copy the first size bytes of a file into the archive; return the number of bytes copied."""
+        self._flush()
+        copied = 0
+        with open(path, 'rb') as source:
+            try:
+                while copied < size:
+                    count = os.copy_file_range(source.fileno(), self.fd, size - copied)
+                    if not count:
+                        break
+                    copied += count
+            except (AttributeError, OSError):
+                source.seek(copied)
+                while copied < size:
+                    block = source.read(min(READ_BLOCK_SIZE, size - copied))
+                    if not block:
+                        break
+                    view = memoryview(block)
+                    while view:
+                        view = view[os.write(self.fd, view):]
+                    copied += len(block)
+        self.offset += copied
+        return copied
+
+    def add(self, member):
+        """Append a member. Return False, leaving the archive as it was, if a stored file shrank meanwhile."""
+        name, flags = encode_name(member.name)
+        date, time_of_day = dos_date_time(member.mtime)
+        header_offset = self.offset
+        zip64 = member.size >= ZIP64_LIMIT or member.compressed_size >= ZIP64_LIMIT
+        extra = struct.pack("<HHQQ", 1, 16, member.size, member.compressed_size) if zip64 else b''
+        self._write(LOCAL_HEADER.pack(
+            b"PK\x03\x04", VERSION_ZIP64 if zip64 else VERSION_DEFAULT, flags, member.method, time_of_day, date,
+            member.crc, ZIP64_LIMIT if zip64 else member.compressed_size, ZIP64_LIMIT if zip64 else member.size,
+            len(name), len(extra)))
+        self._write(name + extra)
+        if member.data is not None:
+            self._write(member.data)
+        else:
+            source = member.spool_file or member.path
+            copied = self._append_file(source, member.compressed_size)
+            if member.spool_file:
+                os.unlink(member.spool_file)
+            if copied < member.compressed_size:
+                os.ftruncate(self.fd, header_offset)
+                os.lseek(self.fd, header_offset, os.SEEK_SET)
+                self.offset = header_offset
+                return False
+
+        # The central directory only carries the zip64 fields that overflow, in this order
+        zip64_fields = [value for value in (member.size, member.compressed_size, header_offset)
+                        if value >= ZIP64_LIMIT]
+        extra = struct.pack(f"<HH{len(zip64_fields)}Q", 1, 8 * len(zip64_fields), *zip64_fields) \
+            if zip64_fields else b''
+        version = VERSION_ZIP64 if zip64_fields else VERSION_DEFAULT
+        self.central_directory.append(CENTRAL_HEADER.pack(
+            b"PK\x01\x02", MADE_BY_UNIX | version, version, flags, member.method, time_of_day, date, member.crc,
+            min(member.compressed_size, ZIP64_LIMIT), min(member.size, ZIP64_LIMIT), len(name), len(extra), 0, 0, 0,
+            (member.mode & 0xFFFF) << 16, min(header_offset, ZIP64_LIMIT)) + name + extra)
+        return True
+
+    def close(self):
+        """Write the central directory and close the file."""
+        start, count = self.offset, len(self.central_directory)
+        for record in self.central_directory:
+            self._write(record)
+        size = self.offset - start
+        if count >= ZIP_COUNT_LIMIT or start >= ZIP64_LIMIT or size >= ZIP64_LIMIT:
+            zip64_end = self.offset
+            self._write(ZIP64_END.pack(b"PK\x06\x06", ZIP64_END.size - 12, MADE_BY_UNIX | VERSION_ZIP64,
+                                       VERSION_ZIP64, 0, 0, count, count, size, start))
+            self._write(ZIP64_LOCATOR.pack(b"PK\x06\x07", 0, zip64_end, 1))
+        self._write(END_OF_CENTRAL_DIRECTORY.pack(b"PK\x05\x06", 0, 0, min(count, ZIP_COUNT_LIMIT),
+                                                  min(count, ZIP_COUNT_LIMIT), min(size, ZIP64_LIMIT),
+                                                  min(start, ZIP64_LIMIT), 0))
+        self._flush()
+        os.close(self.fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            # Do not leave an archive without a central directory behind
+            os.close(self.fd)
+            os.unlink(self.file_name)
+
+
+class CompressedTar:
+    """
+    A streaming tar archive compressed with zstd or xz. The command line tool
+    compresses on all cores; without it xz falls back to the lzma module.
+    """
+
+    def __init__(self, file_name, compression):
+        self.file_name = file_name
+        self._output = open(file_name, 'wb')
+        self._process = None
+        self.tool = TAR_COMPRESSIONS[compression]
+        tool_path = shutil.which(self.tool)
+        if tool_path:
+            self._process = subprocess.Popen([tool_path, "-T0", "-q", "-c"], stdin=subprocess.PIPE,
+                                             stdout=self._output)
+            stream = self._process.stdin
+        elif compression == "xz":
+            import lzma
+            stream = lzma.open(self._output, 'wb')
+        else:
+            self._output.close()
+            os.unlink(file_name)
+            raise OSError(f"{self.tool} is not installed")
+        self._stream = stream
+        self.tar = tarfile.open(fileobj=stream, mode="w|")
+
+    def add(self, path):
+        """Add one file under its base name."""
+        self.tar.add(path, arcname=os.path.basename(path), recursive=False)
+
+    def close(self):
+        self.tar.close()
+        self._stream.close()
+        if self._process is not None and self._process.wait() != 0:
+            self._output.close()
+            raise OSError(f"{self.tool} exited with status {self._process.returncode}")
+        self._output.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
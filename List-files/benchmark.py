@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for list-files.py and list-actions.py.
+
+Builds reproducible synthetic trees (wide, deep, tiny, huge), then times the
+walk, filter/sort, rendering, content search and copy/move/archive on each,
+and copies in list order against the locality orders of list-actions.py.
+Results are printed and written to a JSON file, so runs on different commits
+can be compared. Run: python3 benchmark.py [--shapes wide,deep] [--scale 2]
+"""
+import argparse
+import contextlib
+import datetime
+import importlib.util
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+NEEDLE = "needle"  # phrase planted in some text files for the content search
+
+# Synthetic tree shapes; file counts and sizes are multiplied by --scale
+TREE_SHAPES = {
+    # one level of many directories
+    "wide": dict(depth=1, width=200, files=50, min_size=0, max_size=16 * 1024),
+    # one chain of directories deeper than the recursion limit
+    "deep": dict(depth=0, width=0, files=0, chain=1500, chain_files=2, min_size=0, max_size=4096),
+    # many tiny files in a bushy tree
+    "tiny": dict(depth=3, width=10, files=20, min_size=0, max_size=100),
+    # a few huge files, about half of them incompressible
+    "huge": dict(depth=0, width=0, files=4, min_size=32 * 1024 * 1024, max_size=32 * 1024 * 1024 + 1),
+}
+
+
+def load_script(file_name, module_name):
+    """Import one of the scripts as a module (their file names are not valid module names)."""
+    if SCRIPT_DIR not in sys.path:
+        sys.path.insert(0, SCRIPT_DIR)
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(SCRIPT_DIR, file_name))
+    module = importlib.util.module_from_spec(spec)
+    # Registered so that process pools can pickle the module's worker functions
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_list_files():
+    return load_script("list-files.py", "list_files")
+
+
+def list_files_recursive(directory, file_list):
+    """The original single-threaded walker, kept as the baseline."""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file():
+                file_list.append((entry.path, os.path.getsize(entry.path)))
+            elif entry.is_dir():
+                list_files_recursive(entry.path, file_list)
+
+
+def write_file(path, size, rng, dir_fd=None):
+    """Write a file of the given size: text (sometimes with NEEDLE) or, for odd sizes, random bytes."""
+    text = size % 2 == 0
+    block = (" ".join(rng.choice(("alpha", "beta", "gamma", "delta", NEEDLE if rng.random() < 0.1 else "omega"))
+                      for _ in range(200)) + "\n").encode() if text else rng.randbytes(1024 * 1024)
+    with open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644, dir_fd=dir_fd), "wb") as f:
+        remaining = size
+        while remaining > 0:
+            f.write(block[:remaining])
+            remaining -= len(block)
+
+
+def make_tree(root, shape, scale=1, seed=0):
+    """Create a synthetic tree of the given shape. The same seed always gives the same tree."""
+    rng = random.Random(seed)
+    params = TREE_SHAPES[shape]
+    counter = 0
+
+    def file_size():
+        return rng.randint(params["min_size"], params["max_size"])
+
+    # File names are unique across the tree, so copies into one folder do not collide
+    level = [root]
+    for depth in range(params["depth"] + 1):
+        next_level = []
+        for directory in level:
+            for _ in range(params["files"] * scale):
+                write_file(os.path.join(directory, f"file_{counter:07d}.txt"), file_size(), rng)
+                counter += 1
+            for i in range(params["width"] if depth < params["depth"] else 0):
+                subdir = os.path.join(directory, f"dir_{i}")
+                os.mkdir(subdir)
+                next_level.append(subdir)
+        level = next_level
+
+    # The chain is built with dir_fd, as its paths get longer than the OS accepts
+    directory = os.open(root, os.O_RDONLY)
+    for _ in range(params.get("chain", 0) * scale):
+        os.mkdir("d", dir_fd=directory)
+        subdir = os.open("d", os.O_RDONLY, dir_fd=directory)
+        os.close(directory)
+        directory = subdir
+        for _ in range(params.get("chain_files", 0)):
+            write_file(f"file_{counter:07d}.txt", file_size(), rng, dir_fd=directory)
+            counter += 1
+    os.close(directory)
+
+
+def add_latency(milliseconds):
+    """Emulate a high-latency mount by delaying every directory read."""
+    scandir = os.scandir
+
+    def slow_scandir(path="."):
+        time.sleep(milliseconds / 1000)
+        return scandir(path)
+
+    os.scandir = slow_scandir
+    return lambda: setattr(os, "scandir", scandir)
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process and its finished children, in KB (None where unknown)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    scale = 1 if sys.platform != "darwin" else 1024  # macOS reports bytes
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) // scale
+
+
+class Results:
+    """Collect measurements and print each one as it is taken."""
+
+    def __init__(self):
+        self.records = []
+
+    @contextlib.contextmanager
+    def measure(self, tree, benchmark, files=0, size=0):
+        """
+        Time a block; files and size (bytes) processed give the throughput. The
+        block may set record["files"] and record["bytes"] when it only learns them
+        as it runs. Nothing is recorded if the block raises.
+        """
+        record = {"tree": tree, "benchmark": benchmark, "files": files, "bytes": size}
+        start = time.perf_counter()
+        yield record
+        seconds = time.perf_counter() - start
+        record.update({
+            "seconds": round(seconds, 6),
+            "files_per_s": round(record["files"] / seconds, 1) if seconds else None,
+            "mb_per_s": round(record["bytes"] / 1024 / 1024 / seconds, 2) if seconds else None,
+            "peak_rss_kb": peak_rss_kb(),
+        })
+        self.records.append(record)
+        print(f"  {benchmark:<24}{seconds:>10.3f}s{record['files_per_s'] or 0:>14.0f} files/s"
+              f"{record['mb_per_s'] or 0:>10.1f} MB/s{record['peak_rss_kb'] or 0:>10} KB RSS")
+
+
+def bench_walk(module, results, shape, root, workers):
+    """Compare the original recursive walker with the threaded one and the indexed scan."""
+    try:
+        with results.measure(shape, "walk recursive") as record:
+            files = []
+            list_files_recursive(root, files)
+            record.update(files=len(files), bytes=sum(size for _, size in files))
+    except RecursionError:
+        print("  walk recursive: RecursionError")
+    with results.measure(shape, "walk threaded") as record:
+        files = list(module.walk_files(root, workers))
+        record.update(files=len(files), bytes=sum(size for _, size in files))
+    size = sum(size for _, size in files)
+    with results.measure(shape, "scan cold index", len(files), size):
+        module.scan_directory(root, workers)
+    module.last_scan = None
+    with results.measure(shape, "scan warm index", len(files), size):
+        table = module.scan_directory(root, workers)
+    return table
+
+
+def bench_memory(module, results, shape, root, workers):
+    """Measure the memory a scan result takes per file, with tracemalloc."""
+    import tracemalloc
+    module.last_scan = None
+    tracemalloc.start()
+    table = module.scan_directory(root, workers)
+    module.last_scan = None
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    per_file = size / len(table) if len(table) else 0
+    results.records.append({"tree": shape, "benchmark": "table memory", "files": len(table), "bytes": size,
+                            "bytes_per_file": round(per_file, 1), "peak_rss_kb": peak_rss_kb()})
+    print(f"  {'table memory':<24}{size / 1024 / 1024:>10.1f} MB{per_file:>10.1f} bytes/file")
+    return table
+
+
+def bench_query(module, results, shape, table):
+    """Filter and sort the scanned table the ways the menu does."""
+    total = sum(table.sizes)
+    queries = {
+        "sort size": dict(order_by=[("size", False), ("name", True)]),
+        "sort name": dict(order_by=[("name", True)]),
+        "filter ext + sort date": dict(extension=".txt", order_by=[("date", True), ("name", True)]),
+        "filter size + sort ext": dict(size_operator=">", size_limit=0.001, order_by=[("extension", True)]),
+    }
+    for name, query in queries.items():
+        with results.measure(shape, name, len(table), total):
+            module.query_files(table, **query)
+    rows = range(len(table))
+    with results.measure(shape, "render", len(rows)):
+        out = io.StringIO()
+        for row in rows:
+            out.write(module.format_file_row(table, row) + "\n")
+
+
+def bench_search(module, results, shape, table):
+    rows = range(len(table))
+    with results.measure(shape, "content search", len(table), sum(table.sizes)):
+        matches = sum(1 for _ in module.search_content(table, rows, NEEDLE))
+    print(f"    {matches} files contain '{NEEDLE}'")
+
+
+def run_action(actions, action, *answers):
+    """Run a list-actions.py menu action, answering its prompts in order and hiding its per-file output."""
+    answers = iter(answers)
+    actions.input = lambda prompt="": next(answers)
+    with contextlib.redirect_stdout(io.StringIO()):
+        action()
+
+
+def bench_actions(module, results, shape, table, work):
+    """Copy, archive and move every scanned file through list-actions.py."""
+    actions = load_script("list-actions.py", "list_actions")
+    list_file = os.path.join(work, "all.list")
+    with contextlib.redirect_stdout(io.StringIO()), module.ResultWriter("list", list_file) as writer:
+        for row in range(len(table)):
+            writer.write_row(table, row)
+    actions.loaded_list_file = list_file
+    actions.io_order = "list"
+    count, total = len(table), sum(table.sizes)
+
+    for name in ("copy", "move"):
+        os.mkdir(os.path.join(work, name))
+    with results.measure(shape, "copy", count, total):
+        run_action(actions, lambda: actions.process_files_from_list("Copying", actions.copy_files),
+                   os.path.join(work, "copy"))
+    with results.measure(shape, "archive", count, total):
+        run_action(actions, actions.add_to_archive, "archive", work, "1")
+    with results.measure(shape, "move", count, total):
+        run_action(actions, lambda: actions.process_files_from_list("Moving", actions.move_files),
+                   os.path.join(work, "move"))
+
+
+def drop_page_cache():
+    """Make the next reads come from the disk; needs root on Linux. Return False if that is not possible."""
+    os.sync()
+    try:
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+        return True
+    except OSError:
+        return False
+
+
+def bench_locality(module, results, shape, table, work, drop_caches):
+    """
+    Copy a list sorted by size, as list-files.py writes it, in list order and
+    in the inode and extent orders of the list-actions.py scheduler. The
+    difference only shows with a cold page cache (--drop-caches) on a disk
+    where seeks cost time.
+    """
+    actions = load_script("list-actions.py", "list_actions")
+    list_file = os.path.join(work, "by-size.blist")
+    with contextlib.redirect_stdout(io.StringIO()), module.ResultWriter("binary", list_file) as writer:
+        for row in sorted(range(len(table)), key=table.sizes.__getitem__, reverse=True):
+            writer.write_row(table, row)
+    actions.loaded_list_file = list_file
+    count, total = len(table), sum(table.sizes)
+
+    for order in actions.IO_ORDERS:
+        destination = os.path.join(work, f"copy-{order}")
+        os.mkdir(destination)
+        if drop_caches and not drop_page_cache():
+            print("  cannot drop the page cache (needs root on Linux); reads may come from memory")
+            drop_caches = False
+        actions.io_order = order
+        with results.measure(shape, f"copy {order} order", count, total):
+            run_action(actions, lambda: actions.process_files_from_list("Copying", actions.copy_files), destination)
+        remove_tree(destination)
+    actions.io_order = "list"
+
+
+def remove_tree(root):
+    # shutil.rmtree recurses and cannot remove the deep chain
+    if os.name == "posix":
+        subprocess.run(["rm", "-rf", root])
+    else:
+        shutil.rmtree(root)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPT_DIR, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shapes", default=",".join(TREE_SHAPES), help="comma separated tree shapes to run "
+                                                                         f"(default: {','.join(TREE_SHAPES)})")
+    parser.add_argument("--scale", type=int, default=1, help="multiply file counts by this factor")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the tree generator")
+    parser.add_argument("--latency", type=float, default=0, help="emulated delay per directory read, in ms")
+    parser.add_argument("--workers", type=int, default=32, help="scanner threads")
+    parser.add_argument("--dir", help="create the trees here, e.g. on the disk to measure (default: temp dir)")
+    parser.add_argument("--skip", default="", help="comma separated steps to skip: memory, query, search, actions, "
+                                                   "locality")
+    parser.add_argument("--drop-caches", action="store_true", help="drop the page cache before each locality run "
+                                                                   "(Linux, root)")
+    parser.add_argument("--output", help="JSON result file (default: benchmark_<time>.json)")
+    args = parser.parse_args()
+    shapes = [shape.strip() for shape in args.shapes.split(",")]
+    for shape in shapes:
+        if shape not in TREE_SHAPES:
+            parser.error(f"unknown tree shape: {shape}")
+    skip = set(filter(None, args.skip.split(",")))
+
+    module = load_list_files()
+    results = Results()
+    for shape in shapes:
+        work = tempfile.mkdtemp(prefix="list-files-bench-", dir=args.dir)
+        root = os.path.join(work, "tree")
+        os.mkdir(root)
+        module.scan_index_file = os.path.join(work, "scan_index.db")
+        module.last_scan = None
+        try:
+            print(f"{shape}: generating tree (scale {args.scale}, seed {args.seed})")
+            make_tree(root, shape, args.scale, args.seed)
+            restore_scandir = add_latency(args.latency) if args.latency else None
+            table = bench_walk(module, results, shape, root, args.workers)
+            if restore_scandir:
+                restore_scandir()
+            if "memory" not in skip:
+                table = bench_memory(module, results, shape, root, args.workers)
+            if "query" not in skip:
+                bench_query(module, results, shape, table)
+            if "search" not in skip:
+                bench_search(module, results, shape, table)
+            if "locality" not in skip:
+                bench_locality(module, results, shape, table, work, args.drop_caches)
+            if "actions" not in skip:
+                bench_actions(module, results, shape, table, work)
+        finally:
+            remove_tree(work)
+
+    output = args.output or f"benchmark_{datetime.datetime.now():%Y-%m-%d-%H-%M-%S}.json"
+    with open(output, "w") as f:
+        json.dump({
+            "commit": git_commit(),
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": module.load_numpy() is not None,
+            "arguments": vars(args),
+            "results": results.records,
+        }, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Persistent cache of file content hashes shared by the List-files tools.
+
+Entries are keyed by (device, inode, size, mtime_ns) of the file, so a file
+that has not changed is never read again to be hashed. Import it from another
+script directory with sys.path.insert(0, "<repo>/List-files").
+"""
+import sqlite3
+import time
+
+HASH_CACHE_FILE = "hash_cache.db"
+MAX_AGE_DAYS = 90
+
+
+class HashCache:
+    """
+    Look up and store hashes of files by their stat() result.
+    `kind` names the hash (e.g. 'blake2b-full'), so different hashes of the
+    same file can be cached side by side. hits and misses count lookups.
+    """
+
+    def __init__(self, file_name=HASH_CACHE_FILE):
+        self.connection = sqlite3.connect(file_name)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS hashes (
+                device INTEGER,
+                inode INTEGER,
+                kind TEXT,
+                size INTEGER,
+                mtime_ns INTEGER,
+                digest TEXT,
+                used INTEGER,
+                PRIMARY KEY (device, inode, kind)
+            ) WITHOUT ROWID;
+        """)
+        self.hits = 0
+        self.misses = 0
+        self._used = []
+
+    def get(self, stat, kind):
+        """Return the cached digest for a file, or None if it is unknown or changed since."""
+        row = self.connection.execute(
+            "SELECT size, mtime_ns, digest FROM hashes WHERE device = ? AND inode = ? AND kind = ?",
+            (stat.st_dev, stat.st_ino, kind)).fetchone()
+        if row is None or row[0] != stat.st_size or row[1] != stat.st_mtime_ns:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._used.append((stat.st_dev, stat.st_ino, kind))
+        return row[2]
+
+    def put(self, stat, kind, digest):
+        """Store the digest of a file, replacing any entry of an older version of it."""
+        self.connection.execute("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                (stat.st_dev, stat.st_ino, kind, stat.st_size, stat.st_mtime_ns,
+                                 digest, int(time.time())))
+
+    def evict_stale(self, max_age_days=MAX_AGE_DAYS):
+        """Drop entries that were not used for max_age_days. Returns the number removed."""
+        # Hits of this run count as uses, so record them before looking at the ages
+        self._record_used()
+        cutoff = int(time.time()) - max_age_days * 86400
+        return self.connection.execute("DELETE FROM hashes WHERE used < ?", (cutoff,)).rowcount
+
+    def summary(self):
+        """Describe the hit and miss counts."""
+        lookups = self.hits + self.misses
+        ratio = self.hits / lookups * 100 if lookups else 0
+        return f"hash cache: {self.hits} hits, {self.misses} misses ({ratio:.1f}% hit rate)"
+
+    def _record_used(self):
+        """Write the last-used time of the entries hit since the previous call."""
+        self.connection.executemany("UPDATE hashes SET used = ? WHERE device = ? AND inode = ? AND kind = ?",
+                                    ((int(time.time()), *key) for key in self._used))
+        self._used = []
+
+    def close(self):
+        """Record which entries were used and write everything to disk."""
+        self._record_used()
+        self.connection.commit()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
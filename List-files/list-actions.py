@@ -1,11 +1,21 @@
 #!/usr/bin/env python3
 import os
 import datetime
+import errno
+import queue
+import stat
+import struct
 import subprocess
 import sys
 import shutil
 import re
-import zipfile
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from archive_builder import ZIP_STORED, CompressedTar, ZipWriter, batch_paths, prepare_members
+from list_format import EXTENSION as BINARY_LIST_EXTENSION, ListReader, ListWriter, is_list_file
+from structured_log import StructuredLog
 
 # ANSI Colors
 COLORS = {
@@ -22,6 +32,25 @@ def current_formatted_time():
 # Global Variables
 loaded_list_file = None
 log_file_name = f"log_{current_formatted_time()}.txt"
+log = StructuredLog()  # replaced by one writing to log_file_name when the log file is initialized
+action_workers = None  # worker threads for copying; None means default_workers()
+io_order = "list"  # order in which copy, move and archive read the files, one of IO_ORDERS
+
+COPY_CHUNK_SIZE = 8 * 1024 * 1024  # bytes per copy_file_range/sendfile call
+COPY_BUFFER_SIZE = 1024 * 1024  # buffer of the read/write fallback
+# errno values meaning "this kernel copy does not work for these files", not "the copy failed"
+KERNEL_COPY_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF}
+
+IO_ORDERS = {
+    "list": "as in the list file",
+    "inode": "by device and inode number",
+    "extent": "by device and physical location of the first block (FIEMAP)",
+}
+FS_IOC_FIEMAP = 0xC020660B
+# struct fiemap: fm_start, fm_length, fm_flags, fm_mapped_extents, fm_extent_count, fm_reserved
+FIEMAP_HEADER = struct.Struct("=QQIIII")
+# struct fiemap_extent: fe_logical, fe_physical, fe_length, fe_reserved64[2], fe_flags, fe_reserved[3]
+FIEMAP_EXTENT = struct.Struct("=QQQQQIIII")
 
 def create_script_separator(action, color="RED", total_length=100):
     """Create a script separator with given action, color, and length."""
@@ -29,13 +58,24 @@ def create_script_separator(action, color="RED", total_length=100):
     return f"{COLORS[color]}{base_string.center(total_length, '=')}{COLORS['RESET']}"
 
 def initialize_log_file():
-    with open(log_file_name, 'w') as log_file:
-        log_file.write(create_script_separator("ACTIONS-LOG STARTED") + '\n')
+    """Start the JSON-lines log; the profile summary is printed when the script exits."""
+    global log
+    import atexit
+    log = StructuredLog(log_file_name)
+    log.event("log started", script="list-actions")
+    atexit.register(close_log)
+
+def close_log():
+    """Print the time spent per phase and write the remaining log events."""
+    if log.phases:
+        print(f"{COLORS['BLUE']}PROFILE:{COLORS['RESET']}")
+        for line in log.profile_summary():
+            print(line)
+    log.close()
 
 def write_log(message):
     """Write a log message with a timestamp."""
-    with open(log_file_name, 'a') as log_file:
-        log_file.write(f"{current_formatted_time()} - {message}\n")
+    log.message(message)
 
 def start():
     """Print the start separator and write to the log."""
@@ -46,14 +86,149 @@ def end():
     print(create_script_separator("ENDED"))
     write_log("Script ended")
 
+# Lines of list files: "File: <path>, Size: ..." and "<path> - X MB - Created: ..." written by list-files.py
+LIST_LINE_PATTERNS = [
+    re.compile(r'File: (.*), Size:'),
+    re.compile(r'^(.*) - [\d.]+ MB - Created: '),
+]
+
+def parse_list_line(line):
+    """Return the file path from a line of a list file, or None if the line holds no path."""
+    for pattern in LIST_LINE_PATTERNS:
+        match = pattern.search(line)
+        if match:
+            return match.group(1).strip()
+    return None
+
+def iter_list_paths(list_file):
+    """
+    Yield the file paths of a list file. Binary lists (.blist) are read
+    through a memory map; text lists are parsed line by line.
+    """
+    if is_list_file(list_file):
+        with ListReader(list_file) as reader:
+            yield from reader.paths()
+        return
+    with open(list_file, 'r', encoding='utf-8', errors='surrogateescape') as file:
+        for line in file:
+            file_path = parse_list_line(line)
+            if file_path:
+                yield file_path
+
+def first_extent(file_path):
+    """Return the physical offset of a file's first extent, or None if it has none or FIEMAP is unsupported."""
+    import fcntl
+    request = bytearray(FIEMAP_HEADER.size + FIEMAP_EXTENT.size)
+    FIEMAP_HEADER.pack_into(request, 0, 0, 0xFFFFFFFFFFFFFFFF, 0, 0, 1, 0)
+    try:
+        fd = os.open(file_path, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        fcntl.ioctl(fd, FS_IOC_FIEMAP, request)
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+    if FIEMAP_HEADER.unpack_from(request)[3] == 0:
+        return None
+    return FIEMAP_EXTENT.unpack_from(request, FIEMAP_HEADER.size)[1]
+
+def schedule_paths(file_paths):
+    """
+    Return the paths in io_order. Sorting by device and inode (or by where
+    the data starts on disk) turns a list sorted by size or name into mostly
+    sequential reads on spinning disks and RAID arrays. Files that cannot be
+    stat()ed go last, and files without an extent follow the others by inode.
+    """
+    if io_order == "list":
+        return file_paths
+    keyed = []
+    with log.span("schedule", order=io_order):
+        for file_path in file_paths:
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                keyed.append(((1,), file_path))
+                continue
+            position = first_extent(file_path) if io_order == "extent" else None
+            if position is None:
+                keyed.append(((0, st.st_dev, 1, st.st_ino), file_path))
+            else:
+                keyed.append(((0, st.st_dev, 0, position), file_path))
+        keyed.sort()
+    return [file_path for _, file_path in keyed]
+
 def get_file_action_confirmation(action):
     """Get user confirmation for file actions."""
     user_input = input(f"Are you sure you want to {action} these files? (yes/no): ").lower()
     write_log(f"User was asked for confirmation to {action} files. User response: {user_input}")
     return user_input == 'yes'
 
+def default_workers():
+    """Copies wait on disks and the network rather than the CPU, so use more threads than cores."""
+    return min(32, (os.cpu_count() or 1) * 4)
+
+def run_in_pool(function, items, workers=None, executor=ThreadPoolExecutor):
+    """
+    Call function(item) for every item in a thread (or process) pool and yield
+    (item, result, exception) as calls finish. Only a few items per worker are
+    queued at a time, so a list of millions of files is never held in memory.
+    """
+    workers = workers or action_workers or default_workers()
+    finished = queue.Queue()
+    with executor(workers) as pool:
+        pending = 0
+        for item in items:
+            if pending >= workers * 4:
+                yield _pool_outcome(finished.get())
+                pending -= 1
+            future = pool.submit(function, item)
+            future.item = item
+            future.add_done_callback(finished.put)
+            pending += 1
+        for _ in range(pending):
+            yield _pool_outcome(finished.get())
+
+def _pool_outcome(future):
+    exception = future.exception()
+    return future.item, None if exception else future.result(), exception
+
+class ActionReport:
+    """Counts of a bulk action, printed and logged as one summary instead of a line per file."""
+
+    def __init__(self, action, count_bytes=True):
+        self.action = action
+        self.count_bytes = count_bytes
+        self.counts = {}  # outcome, e.g. "copied" or "skipped" -> number of files
+        self.bytes = 0
+        self.start = time.perf_counter()
+
+    def add(self, outcome, size=0, count=1):
+        self.counts[outcome] = self.counts.get(outcome, 0) + count
+        self.bytes += size
+
+    def summary(self):
+        seconds = max(time.perf_counter() - self.start, 1e-9)
+        files = sum(self.counts.values())
+        counts = ", ".join(f"{outcome}: {count}" for outcome, count in sorted(self.counts.items()))
+        if not self.count_bytes:
+            return f"{self.action}: {files} files ({counts}) in {seconds:.2f} s, {files / seconds:.0f} files/s"
+        return (f"{self.action}: {files} files ({counts}), {self.bytes / (1024 * 1024):.1f} MB in {seconds:.2f} s, "
+                f"{self.bytes / (1024 * 1024) / seconds:.1f} MB/s, {files / seconds:.0f} files/s")
+
+    def print_summary(self):
+        summary = self.summary()
+        print(f"{COLORS['GREEN']}{summary}{COLORS['RESET']}")
+        log.event("summary", action=self.action, counts=self.counts, bytes=self.bytes,
+                  seconds=round(time.perf_counter() - self.start, 6))
+        write_log(summary)
+
 def process_files_from_list(action, process_function):
-    """General function to process files from the loaded list."""
+    """
+    General function to process files from the loaded list; process_function
+    gets an iterable of the listed paths and the destination folder.
+    """
     global loaded_list_file
     if not loaded_list_file:
         print(f"{COLORS['RED']}No list file loaded. Please load a list file first.{COLORS['RESET']}")
@@ -65,35 +240,281 @@ def process_files_from_list(action, process_function):
         print(f"{COLORS['RED']}Destination folder does not exist or is not a directory.{COLORS['RESET']}")
         return
 
-    with open(loaded_list_file, 'r') as file:
-        for line in file:
-            match = re.search(r'File: (.*), Size:', line)
-            if match:
-                file_path = match.group(1).strip()
-                process_function(file_path, destination_folder)
+    with log.span("action", action=action, list_file=loaded_list_file):
+        process_function(schedule_paths(iter_list_paths(loaded_list_file)), destination_folder)
 
-def copy_file(file_path, destination_folder):
-    """Copy a file to the specified destination folder."""
+def _copy_file_range(source_fd, destination_fd, size):
+    copied = 0
+    while copied < size:
+        count = os.copy_file_range(source_fd, destination_fd, min(size - copied, COPY_CHUNK_SIZE))
+        if not count:
+            break
+        copied += count
+
+def _sendfile(source_fd, destination_fd, size):
+    offset = start = os.lseek(source_fd, 0, os.SEEK_CUR)
+    try:
+        while offset - start < size:
+            sent = os.sendfile(destination_fd, source_fd, offset, min(size - offset + start, COPY_CHUNK_SIZE))
+            if not sent:
+                break
+            offset += sent
+    finally:
+        os.lseek(source_fd, offset, os.SEEK_SET)
+
+KERNEL_COPY_METHODS = [(name, method) for name, method in (("copy_file_range", _copy_file_range),
+                                                           ("sendfile", _sendfile)) if hasattr(os, name)]
+
+def copy_file_data(source_fd, destination_fd, size):
+    """
+    Copy an open file into another, inside the kernel where the filesystems
+    allow it, and return the name of the method that did the copy. Kernel
+    copies stop at size, the length from fstat(), so a small file takes one
+    system call instead of a second one to find the end.
+    """
+    for name, method in KERNEL_COPY_METHODS:
+        try:
+            method(source_fd, destination_fd, size)
+            return name
+        except OSError as e:
+            if e.errno not in KERNEL_COPY_UNSUPPORTED:
+                raise
+    buffer = bytearray(min(size + 1, COPY_BUFFER_SIZE))
+    view = memoryview(buffer)
+    while True:
+        read = os.readv(source_fd, [buffer])
+        if not read:
+            return "buffered"
+        written = 0
+        while written < read:
+            written += os.write(destination_fd, view[written:read])
+
+def copy_file(file_path, destination_folder, preserve_times=False):
+    """
+    Copy a file's data and permission bits (like shutil.copy) into the
+    destination folder, and its access and modification times if
+    preserve_times (like shutil.copy2). Return ("copied", size, method), or
+    ("skipped", 0, None) if the folder already holds a file of that name.
+    """
     destination_file = os.path.join(destination_folder, os.path.basename(file_path))
-    if not os.path.exists(destination_file):
-        shutil.copy(file_path, destination_file)
-        print(f"Copied {file_path} to {destination_folder}")
-        write_log(f"Copied {file_path} to {destination_folder}")
-    else:
-        print(f"Skipped {file_path} because it already exists in the destination folder.")
-        write_log(f"Skipped {file_path} because it already exists in the destination folder.")
-
-def move_file(file_path, destination_folder):
-    """Move a file to the specified destination folder."""
+    source_fd = os.open(file_path, os.O_RDONLY)
+    try:
+        source_stat = os.fstat(source_fd)
+        try:
+            # O_EXCL: two listed files with the same name cannot overwrite each other
+            destination_fd = os.open(destination_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            return "skipped", 0, None
+        try:
+            method = copy_file_data(source_fd, destination_fd, source_stat.st_size)
+            os.fchmod(destination_fd, stat.S_IMODE(source_stat.st_mode))
+            if preserve_times:
+                os.utime(destination_fd, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+        except BaseException:
+            os.close(destination_fd)
+            os.unlink(destination_file)
+            raise
+        os.close(destination_fd)
+    finally:
+        os.close(source_fd)
+    return "copied", source_stat.st_size, method
+
+def copy_files(file_paths, destination_folder):
+    """Copy files into the destination folder in parallel and print one throughput summary."""
+    report = ActionReport("Copying")
+    for file_path, result, error in run_in_pool(lambda path: copy_file(path, destination_folder), file_paths):
+        if error is not None:
+            report.add("failed")
+            print(f"{COLORS['RED']}Could not copy {file_path}: {error}{COLORS['RESET']}")
+            log.event("copy failed", source=file_path, error=str(error))
+            continue
+        outcome, size, method = result
+        report.add(outcome, size)
+        if outcome == "skipped":
+            log.event("copy skipped", source=file_path, reason="exists in destination")
+        else:
+            log.event("copied", source=file_path, destination=destination_folder, size=size, method=method)
+    report.print_summary()
+
+def device_name(device):
+    return f"{os.major(device)}:{os.minor(device)}"
+
+def plan_moves(file_paths, destination_folder):
+    """
+    Group the files by (source device, destination device). Return
+    {(source device, destination device): [(path, size, mtime_ns, mode)]},
+    the list of paths that do not exist and (path, error) for the paths that
+    could not be looked at, e.g. without permission.
+    """
+    destination_device = os.stat(destination_folder).st_dev
+    groups, missing, failed = {}, [], []
+    for file_path in file_paths:
+        try:
+            st = os.lstat(file_path)
+        except FileNotFoundError:
+            missing.append(file_path)
+            continue
+        except OSError as e:
+            failed.append((file_path, e))
+            continue
+        groups.setdefault((st.st_dev, destination_device), []).append(
+            (file_path, st.st_size, st.st_mtime_ns, st.st_mode))
+    return groups, missing, failed
+
+def rename_file(entry, destination_folder):
+    """Move a file within its filesystem: one atomic rename, no data copied."""
+    file_path, size, *_ = entry
     destination_file = os.path.join(destination_folder, os.path.basename(file_path))
-    if not os.path.exists(destination_file):
-        shutil.move(file_path, destination_folder)
-        print(f"Moved {file_path} to {destination_folder}")
-        write_log(f"Moved {file_path} to {destination_folder}")
-    else:
-        print(f"Skipped {file_path} because it already exists in the destination folder.")
-        write_log(f"Skipped {file_path} because it already exists in the destination folder.")
-
+    if os.path.lexists(destination_file):
+        return "skipped", 0
+    os.rename(file_path, destination_file)
+    return "renamed", size
+
+def rename_files(entries, destination_folder):
+    """
+    Rename the entries one after another, yielding (entry, result, exception)
+    like run_in_pool. Bind mounts share st_dev but refuse a rename with EXDEV;
+    such an entry is copied and unlinked instead and reported as "moved".
+    """
+    for entry in entries:
+        try:
+            yield entry, rename_file(entry, destination_folder), None
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                yield entry, None, e
+                continue
+            log.event("rename fallback", source=entry[0], reason="EXDEV")
+            try:
+                yield entry, copy_and_unlink(entry, destination_folder), None
+            except OSError as e:
+                yield entry, None, e
+
+def copy_and_unlink(entry, destination_folder):
+    """
+    Move a file to another filesystem: copy it with its times (like
+    shutil.move), check that the copy has the planned size and that the source
+    did not change meanwhile, then remove the source. A symlink is recreated
+    pointing to the same target, as shutil.move does, instead of being followed.
+    """
+    file_path, size, mtime_ns, mode = entry
+    if stat.S_ISLNK(mode):
+        destination_file = os.path.join(destination_folder, os.path.basename(file_path))
+        if os.path.lexists(destination_file):
+            return "skipped", 0
+        os.symlink(os.readlink(file_path), destination_file)
+        os.unlink(file_path)
+        return "moved", size
+    outcome, copied, _ = copy_file(file_path, destination_folder, preserve_times=True)
+    if outcome == "skipped":
+        return "skipped", 0
+    destination_file = os.path.join(destination_folder, os.path.basename(file_path))
+    source_stat = os.lstat(file_path)
+    if (copied, os.stat(destination_file).st_size) != (size, size) or \
+            (source_stat.st_size, source_stat.st_mtime_ns) != (size, mtime_ns):
+        os.unlink(destination_file)
+        raise OSError(f"{file_path} changed while it was moved; the source was kept")
+    os.unlink(file_path)
+    return "moved", size
+
+def move_files(file_paths, destination_folder):
+    """
+    Move files into the destination folder. Files on the destination's
+    filesystem are renamed in place (or copied when the rename fails with
+    EXDEV); the others are copied in parallel, checked and then removed. The plan and the time of every group are reported.
+    """
+    groups, missing, failed = plan_moves(file_paths, destination_folder)
+    print(f"{COLORS['GREEN']}Move plan:{COLORS['RESET']}")
+    for (source_device, destination_device), entries in groups.items():
+        method = "rename" if source_device == destination_device else "copy, verify, unlink"
+        print(f"  device {device_name(source_device)} -> {device_name(destination_device)}: {len(entries)} files, "
+              f"{sum(entry[1] for entry in entries) / (1024 * 1024):.1f} MB by {method}")
+    if missing:
+        print(f"  {len(missing)} files do not exist")
+    for file_path, error in failed:
+        print(f"{COLORS['RED']}Could not move {file_path}: {error}{COLORS['RESET']}")
+        log.event("move failed", source=file_path, error=str(error))
+    log.event("move plan", destination=destination_folder, missing=len(missing), failed=len(failed),
+              groups=[{"source_device": device_name(source_device), "destination_device": device_name(destination_device),
+                       "files": len(entries), "same_device": source_device == destination_device}
+                      for (source_device, destination_device), entries in groups.items()])
+
+    for (source_device, destination_device), entries in groups.items():
+        same_device = source_device == destination_device
+        with log.span("action", action="Moving", source_device=device_name(source_device),
+                      destination_device=device_name(destination_device), same_device=same_device):
+            report = ActionReport(f"Moving {device_name(source_device)} -> {device_name(destination_device)} "
+                                  f"({'rename' if same_device else 'copy'})")
+            if same_device:
+                # Renames only touch metadata; a pool would not make them faster
+                outcomes = rename_files(entries, destination_folder)
+            else:
+                outcomes = run_in_pool(lambda entry: copy_and_unlink(entry, destination_folder), entries)
+            for (file_path, *_), result, error in outcomes:
+                if error is not None:
+                    report.add("failed")
+                    print(f"{COLORS['RED']}Could not move {file_path}: {error}{COLORS['RESET']}")
+                    log.event("move failed", source=file_path, error=str(error))
+                    continue
+                outcome, size = result
+                report.add(outcome, size)
+                log.event(outcome, source=file_path, destination=destination_folder)
+        report.print_summary()
+    if missing:
+        log.event("move skipped", reason="does not exist", files=missing)
+
+
+ARCHIVE_FORMATS = [
+    ("zip", ".zip", None),
+    ("tar + zstd", ".tar.zst", "zst"),
+    ("tar + xz", ".tar.xz", "xz"),
+]
+
+def build_zip(file_paths, archive_path):
+    """
+    Deflate the listed files on all cores and write them into one zip archive.
+    Members are written in the order they finish, not in list order.
+    """
+    report = ActionReport("Archiving")
+    spool_dir = tempfile.mkdtemp(prefix=".archive-", dir=os.path.dirname(archive_path) or ".")
+    try:
+        with ZipWriter(archive_path) as archive:
+            tasks = ((batch, spool_dir) for batch in batch_paths(file_paths))
+            for (batch, _), results, pool_error in run_in_pool(prepare_members, tasks, os.cpu_count(),
+                                                               ProcessPoolExecutor):
+                if pool_error is not None:
+                    results = [(file_path, None, pool_error) for file_path in batch]
+                for file_path, member, error in results:
+                    if error is None and member is not None and not archive.add(member):
+                        error = "file changed while archiving"
+                    if error is not None:
+                        report.add("failed")
+                        print(f"{COLORS['RED']}Could not archive {file_path}: {error}{COLORS['RESET']}")
+                        log.event("archive failed", source=file_path, error=str(error))
+                    elif member is None:
+                        report.add("missing")
+                    else:
+                        report.add("stored" if member.method == ZIP_STORED else "deflated", member.size)
+    finally:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+    report.print_summary()
+
+def build_tar(file_paths, archive_path, compression):
+    """Stream the listed files into a tar archive compressed with zstd or xz."""
+    report = ActionReport("Archiving")
+    with CompressedTar(archive_path, compression) as archive:
+        for file_path in file_paths:
+            try:
+                archive.add(file_path)
+            except FileNotFoundError:
+                report.add("missing")
+            except OSError as e:
+                report.add("failed")
+                print(f"{COLORS['RED']}Could not archive {file_path}: {e}{COLORS['RESET']}")
+                log.event("archive failed", source=file_path, error=str(e))
+            else:
+                report.add("added", archive.tar.members[-1].size)
+                archive.tar.members.clear()  # tarfile keeps every member otherwise
+    report.print_summary()
 
 def add_to_archive():
     """Add files from the list to an archive."""
@@ -108,16 +529,85 @@ def add_to_archive():
         print(f"{COLORS['RED']}Destination folder does not exist or is not a directory.{COLORS['RESET']}")
         write_log("Destination folder does not exist or is not a directory.")
         return
-
-    archive_path = os.path.join(destination_folder, f"{archive_name}.zip")
-    with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        with open(loaded_list_file, 'r') as file:
-            for line in file:
-                match = re.search(r'File: (.*), Size:', line)
-                if match and os.path.exists(match.group(1).strip()):
-                    zipf.write(match.group(1).strip(), os.path.basename(match.group(1).strip()))
-            print(f"Created archive {archive_path}")
-            write_log(f"Created archive {archive_path}")
+    for i, (name, extension, _) in enumerate(ARCHIVE_FORMATS, 1):
+        print(f"{COLORS['GREEN']}({i}){COLORS['RESET']} {name} ({extension})")
+    choice = input(f"Archive format (1-{len(ARCHIVE_FORMATS)}, Enter for zip): ").strip() or "1"
+    if not choice.isdigit() or not 1 <= int(choice) <= len(ARCHIVE_FORMATS):
+        print(f"{COLORS['RED']}Invalid choice. Please enter a valid option.{COLORS['RESET']}")
+        return
+    _, extension, compression = ARCHIVE_FORMATS[int(choice) - 1]
+
+    archive_path = os.path.join(destination_folder, f"{archive_name}{extension}")
+    with log.span("action", action="Archiving", list_file=loaded_list_file, archive=archive_path):
+        try:
+            file_paths = schedule_paths(iter_list_paths(loaded_list_file))
+            if compression is None:
+                build_zip(file_paths, archive_path)
+            else:
+                build_tar(file_paths, archive_path, compression)
+        except OSError as e:
+            print(f"{COLORS['RED']}Could not create archive {archive_path}: {e}{COLORS['RESET']}")
+            write_log(f"Could not create archive {archive_path}: {e}")
+            return
+    print(f"Created archive {archive_path}")
+    write_log(f"Created archive {archive_path}")
+
+DELETE_BATCH_SIZE = 1024  # names unlinked per task; big directories are split across workers
+
+def group_by_directory(file_paths):
+    """Return {directory: [names]} for the paths, so each directory is opened once."""
+    directories = {}
+    for file_path in file_paths:
+        directory, name = os.path.split(file_path)
+        directories.setdefault(directory or os.curdir, []).append(name)
+    return directories
+
+def delete_batch(task):
+    """
+    Unlink names relative to an open descriptor of their directory, which
+    saves resolving the full path for every file. Return the deleted names,
+    the names that were already gone, and (name, error) pairs of the failures.
+    """
+    directory, names = task
+    deleted, missing, failed = [], [], []
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    except FileNotFoundError:
+        return deleted, names, failed
+    try:
+        for name in names:
+            try:
+                os.unlink(name, dir_fd=dir_fd)
+                deleted.append(name)
+            except FileNotFoundError:
+                missing.append(name)
+            except OSError as e:
+                failed.append((name, e))
+    finally:
+        os.close(dir_fd)
+    return deleted, missing, failed
+
+def bulk_delete(file_paths):
+    """
+    Delete files grouped by parent directory, directories in parallel, and log
+    one event per batch instead of one line per file.
+    """
+    report = ActionReport("Deleting", count_bytes=False)
+    tasks = ((directory, names[start:start + DELETE_BATCH_SIZE])
+             for directory, names in group_by_directory(file_paths).items()
+             for start in range(0, len(names), DELETE_BATCH_SIZE))
+    for (directory, names), result, error in run_in_pool(delete_batch, tasks):
+        if error is not None:
+            result = [], [], [(name, error) for name in names]
+        deleted, missing, failed = result
+        for outcome, names in (("deleted", deleted), ("missing", missing), ("failed", failed)):
+            if names:
+                report.add(outcome, count=len(names))
+        for name, e in failed:
+            print(f"{COLORS['RED']}Could not delete {os.path.join(directory, name)}: {e}{COLORS['RESET']}")
+        log.event("deleted", directory=directory, files=deleted, missing=missing,
+                  failed=[(name, str(e)) for name, e in failed])
+    report.print_summary()
 
 def delete_files():
     """Delete files from the list."""
@@ -126,20 +616,9 @@ def delete_files():
         write_log("No list file loaded. Please load a list file first.")
         return
 
-    # Rest of the code...
-
-        print(f"{COLORS['RED']}No list file loaded. Please load a list file first.{COLORS['RESET']}")
-        write_log("No list file loaded. Please load a list file first.")
-        return
-
     if get_file_action_confirmation("delete"):
-        with open(loaded_list_file, 'r') as file:
-            for line in file:
-                match = re.search(r'File: (.*), Size:', line)
-                if match and os.path.exists(match.group(1).strip()):
-                    os.remove(match.group(1).strip())
-                    print(f"Deleted {match.group(1).strip()}")
-                    write_log(f"Deleted {match.group(1).strip()}")
+        with log.span("action", action="Deleting", list_file=loaded_list_file):
+            bulk_delete(iter_list_paths(loaded_list_file))
     else:
         print("Deletion canceled.")
         write_log("Deletion canceled.")
@@ -151,6 +630,15 @@ def load_list_file():
     if list_file_path == "":
         return  # Return to the main menu if Enter is pressed
     elif os.path.exists(list_file_path):
+        if is_list_file(list_file_path):
+            try:
+                with ListReader(list_file_path) as reader:
+                    records = len(reader)
+            except ValueError as e:
+                print(f"{COLORS['RED']}{e}{COLORS['RESET']}")
+                write_log(f"Could not load list file: {e}")
+                return
+            print(f"Binary list with {COLORS['GREEN']}{records}{COLORS['RESET']} files")
         loaded_list_file = list_file_path
         print(f"Loaded list file: {list_file_path}")
         write_log(f"Loaded list file: {list_file_path}")
@@ -176,7 +664,13 @@ def display_loaded_list_file():
 
 # Function to display the loaded list file
 def display_loaded_list():
-    if loaded_list_file:
+    if loaded_list_file and is_list_file(loaded_list_file):
+        print(f"{COLORS['GREEN']}Loaded list file content:{COLORS['RESET']}")
+        with ListReader(loaded_list_file) as reader:
+            for path, size, mtime, ctime, inode in reader:
+                print(f"{path} - {size / (1024 * 1024):.2f} MB - Created: "
+                      f"{datetime.datetime.fromtimestamp(ctime).strftime('%Y-%m-%d %H:%M:%S')}")
+    elif loaded_list_file:
         with open(loaded_list_file, 'r') as file:
             print(f"{COLORS['GREEN']}Loaded list file content:{COLORS['RESET']}")
             for line in file:
@@ -184,12 +678,42 @@ def display_loaded_list():
     else:
         print(f"{COLORS['RED']}No list file loaded.{COLORS['RESET']}")  
 
+def convert_list_file():
+    """
+    Write the loaded text list as a binary list next to it and load that
+    instead. Sizes and dates are read from the files, so missing files are left out.
+    """
+    global loaded_list_file
+    if not loaded_list_file:
+        print(f"{COLORS['RED']}No list file loaded. Please load a list file first.{COLORS['RESET']}")
+        return
+    if is_list_file(loaded_list_file):
+        print(f"{loaded_list_file} is already a binary list.")
+        return
+
+    binary_list_file = os.path.splitext(loaded_list_file)[0] + BINARY_LIST_EXTENSION
+    missing = 0
+    with log.span("action", action="Converting", list_file=loaded_list_file), \
+            open(binary_list_file, 'wb', buffering=1024 * 1024) as file, ListWriter(file) as writer:
+        for file_path in iter_list_paths(loaded_list_file):
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                missing += 1
+                continue
+            writer.add(file_path, st.st_size, st.st_mtime, st.st_ctime, st.st_ino)
+    print(f"Wrote {COLORS['GREEN']}{len(writer)}{COLORS['RESET']} files to {binary_list_file}"
+          + (f" ({missing} missing files skipped)" if missing else ""))
+    write_log(f"Converted {loaded_list_file} to {binary_list_file}: {len(writer)} files, {missing} missing")
+    loaded_list_file = binary_list_file
+
 def load_list_file_menu():
     """Display and handle the 'Load list file' menu."""
     menu_options = [
         "Choose list file",
         "Close list file",
         "Show available list files",
+        "Convert list file to binary (.blist)",
         "Back"
     ]
     while True:
@@ -209,6 +733,9 @@ def load_list_file_menu():
             list_available_list_files()
             write_log("Loaded list file menu: Show available list files")
         elif choice == '4':
+            convert_list_file()
+            write_log("Loaded list file menu: Convert list file")
+        elif choice == '5':
             break
         else:
             print(f"{COLORS['RED']}Invalid choice. Please enter a valid option.{COLORS['RESET']}")
@@ -216,8 +743,8 @@ def load_list_file_menu():
 
 
 def list_available_list_files():
-    """List all available .list files in the current directory."""
-    list_files = [f for f in os.listdir('.') if f.endswith('.list')]
+    """List all available .list and .blist files in the current directory."""
+    list_files = [f for f in os.listdir('.') if f.endswith(('.list', BINARY_LIST_EXTENSION))]
     if list_files:
         print(f"{COLORS['GREEN']}Available list files:{COLORS['RESET']}")
         for file in list_files:
@@ -227,6 +754,27 @@ def list_available_list_files():
         print(f"{COLORS['RED']}No list files available.{COLORS['RESET']}")
         write_log("No list files available")
 
+def get_action_workers():
+    """Ask the user for the number of worker threads used by bulk actions."""
+    current = action_workers or default_workers()
+    workers = input(f"Enter the number of worker threads {COLORS['RED']}(currently {current}){COLORS['RESET']}: ").strip()
+    if workers.isdigit() and int(workers) > 0:
+        return int(workers)
+    print(f"{COLORS['RED']}Invalid number of threads.{COLORS['RESET']}")
+    return action_workers
+
+def get_io_order():
+    """Ask the user for the order in which copy, move and archive read the files."""
+    orders = list(IO_ORDERS)
+    print(f"Current I/O order: {COLORS['GREEN']}{io_order}{COLORS['RESET']}")
+    for i, order in enumerate(orders, 1):
+        print(f"{COLORS['GREEN']}({i}){COLORS['RESET']} {order}: {IO_ORDERS[order]}")
+    choice = input(f"Choice (1-{len(orders)}): ").strip()
+    if choice.isdigit() and 1 <= int(choice) <= len(orders):
+        return orders[int(choice) - 1]
+    print(f"{COLORS['RED']}Invalid choice. Please enter a valid option.{COLORS['RESET']}")
+    return io_order
+
 def display_main_menu():
     """Display the main menu of the script."""
     menu_options = [
@@ -236,6 +784,8 @@ def display_main_menu():
         "Add files from the list to archive",
         "Delete files from the list",
         "Display loaded list",
+        "Set worker threads",
+        "I/O order",
         "Go back to main menu",
         "Exit"
     ]
@@ -247,13 +797,14 @@ def display_main_menu():
 
 def handle_menu_choice(choice):
     """Handle the user's menu choice."""
+    global action_workers, io_order
     write_log(f"User selected menu choice: {choice}")
     if choice == '1':
         load_list_file_menu()
     elif choice == '2':
-        process_files_from_list("Copying", copy_file)
+        process_files_from_list("Copying", copy_files)
     elif choice == '3':
-        process_files_from_list("Moving", move_file)
+        process_files_from_list("Moving", move_files)
     elif choice == '4':
         add_to_archive()
     elif choice == '5':
@@ -261,9 +812,15 @@ def handle_menu_choice(choice):
     elif choice == '6':
         display_loaded_list()
     elif choice == '7':
+        action_workers = get_action_workers()
+        write_log(f"Worker threads set to {action_workers}")
+    elif choice == '8':
+        io_order = get_io_order()
+        write_log(f"I/O order set to {io_order}")
+    elif choice == '9':
         subprocess.run([sys.executable, 'list-files.py'])
         sys.exit()
-    elif choice == '8':
+    elif choice == '10':
         finalize_and_exit()
     else:
         write_log(f"Invalid choice: {choice}")
@@ -273,8 +830,7 @@ def handle_menu_choice(choice):
 def finalize_and_exit():
     """Finalize the script and exit."""
     write_log("Finalizing the script and exiting")
-    with open(log_file_name, 'a') as log_file:
-        log_file.write(create_script_separator("ACTIONS-LOG ENDED") + '\n')
+    log.event("log ended", script="list-actions")
     sys.exit()
 
 def main():
@@ -1,8 +1,14 @@
 #!/usr/bin/env python3
 import os
 import datetime
-import subprocess
+import mmap
+import queue
+import stat as stat_module
 import sys
+from array import array
+
+from list_format import ListReader, ListWriter, is_list_file
+from structured_log import StructuredLog
 
 
 # ANSI Colors
@@ -20,7 +26,32 @@ def current_formatted_time():
 # Global Variables
 loaded_list_file = None
 log_file_name = f"log_{current_formatted_time()}.log"
+scan_index_file = "scan_index.db"
+scan_index_version = 4
+content_index_file = "content_index.db"
+content_index_version = 3
+content_index_max_size = 64 * 1024 * 1024
+scan_workers = min(32, (os.cpu_count() or 1) * 4)
+search_workers = os.cpu_count() or 1
+search_chunk_size = 4 * 1024 * 1024
+duplicate_block_size = 64 * 1024
+numpy_min_rows = 50000  # smaller tables are queried in plain Python, without paying for the NumPy import
+scan_excludes = []  # gitignore-style patterns of files and directories that are not scanned
+scan_includes = []  # if not empty, only files matching one of these patterns are listed
+one_filesystem = False  # do not descend into directories on other filesystems
 global_directory_path = None
+output_format = "list"
+last_scan = None  # (root, FileTable) of the most recent scan
+live_scan = None  # LiveScan keeping the table of the mounted path current, if live mode is on
+log = StructuredLog()  # replaced by one writing to log_file_name when the log file is initialized
+
+# Result file formats: extension of the saved file for each format
+OUTPUT_FORMATS = {
+    "list": ".list",
+    "jsonl": ".jsonl",
+    "csv": ".csv",
+    "binary": ".blist",
+}
 
 
 def create_script_separator(action, color="RED", total_length=100):
@@ -29,13 +60,24 @@ def create_script_separator(action, color="RED", total_length=100):
     return f"{COLORS[color]}{base_string.center(total_length, '=')}{COLORS['RESET']}"
 
 def initialize_log_file():
-    with open(log_file_name, 'w') as log_file:
-        log_file.write(create_script_separator("ACTIONS-LOG STARTED") + '\n')
+    """Start the JSON-lines log; the profile summary is printed when the script exits."""
+    global log
+    import atexit
+    log = StructuredLog(log_file_name)
+    log.event("log started", script="list-files")
+    atexit.register(close_log)
+
+def close_log():
+    """Print the time spent per phase and write the remaining log events."""
+    if log.phases:
+        print(f"{COLORS['BLUE']}PROFILE:{COLORS['RESET']}")
+        for line in log.profile_summary():
+            print(line)
+    log.close()
 
 def write_log(message):
     """Write a log message with a timestamp."""
-    with open(log_file_name, 'a') as log_file:
-        log_file.write(f"{current_formatted_time()} - {message}\n")
+    log.message(message)
 
 def start():
     """Print the start separator and write to the log."""
@@ -50,27 +92,807 @@ def end():
 def finalize_and_exit():
     """Finalize the script and exit."""
     write_log("Finalizing the script and exiting")
-    with open(log_file_name, 'a') as log_file:
-        log_file.write(create_script_separator("ACTIONS-LOG ENDED") + '\n')
+    log.event("log ended", script="list-files")
     sys.exit()
 
-def list_files_recursive(directory, file_list):
-    """Rekursywnie listuje pliki w podanym katalogu."""
-    with os.scandir(directory) as entries:
+class FileTable:
+    """
+    Scan results kept column by column in compact arrays.
+    The walker stats every file once; filters, sorts and rendering read the
+    columns instead of asking the filesystem again. Row i describes one file.
+    Paths are not stored whole: each row holds the id of its directory and the
+    position of its encoded file name in one shared byte buffer, and path(row)
+    rebuilds the path only when it is shown or used.
+    """
+    __slots__ = ("dirs", "_dir_lookup", "dir_ids", "_name_data", "_name_starts", "_name_lengths", "sizes", "mtimes",
+                 "ctimes", "inodes", "ext_codes", "extensions", "_ext_lookup", "_name_index", "directories", "_rows")
+    _encoding = sys.getfilesystemencoding()
+    _errors = sys.getfilesystemencodeerrors()
+
+    def __init__(self):
+        self.dirs = []  # directory id -> directory path ending with a separator
+        self._dir_lookup = {}
+        self.dir_ids = array('I')
+        self._name_data = bytearray()
+        self._name_starts = array('Q')
+        self._name_lengths = array('H')
+        self.sizes = array('q')
+        self.mtimes = array('d')
+        self.ctimes = array('d')
+        self.inodes = array('Q')
+        self.ext_codes = array('I')
+        self.extensions = []
+        self._ext_lookup = {}
+        self._name_index = None
+        self.directories = {}  # directory path -> (size, file count) of the files directly inside it
+        self._rows = None  # path -> row, kept once track_rows() is called
+
+    def __len__(self):
+        return len(self.dir_ids)
+
+    def name(self, row):
+        """Return the file name of a row."""
+        start = self._name_starts[row]
+        return self._name_data[start:start + self._name_lengths[row]].decode(self._encoding, self._errors)
+
+    def path(self, row):
+        """Rebuild the full path of a row."""
+        return self.dirs[self.dir_ids[row]] + self.name(row)
+
+    def iter_names(self):
+        """Yield the file name of every row in order."""
+        return map(self.name, range(len(self)))
+
+    def iter_paths(self):
+        """Yield the full path of every row in order."""
+        return map(self.path, range(len(self)))
+
+    def directory_id(self, directory):
+        """Return the id standing for a directory, registering it if new."""
+        dir_id = self._dir_lookup.get(directory)
+        if dir_id is None:
+            dir_id = self._dir_lookup[directory] = len(self.dirs)
+            self.dirs.append(directory if directory.endswith(os.sep) else directory + os.sep)
+        return dir_id
+
+    def add_entry(self, dir_id, name, size, mtime, ctime, inode):
+        """Append one file of an already registered directory."""
+        if self._rows is not None:
+            self._rows[self.dirs[dir_id] + name] = len(self)
+        encoded = name.encode(self._encoding, self._errors)
+        self.dir_ids.append(dir_id)
+        self._name_starts.append(len(self._name_data))
+        self._name_lengths.append(len(encoded))
+        self._name_data += encoded
+        self.sizes.append(size)
+        self.mtimes.append(mtime)
+        self.ctimes.append(ctime)
+        self.inodes.append(inode)
+        self.ext_codes.append(self.extension_code(os.path.splitext(name)[1]))
+
+    def add(self, path, size, mtime, ctime, inode):
+        """Append one file to the table."""
+        directory, name = os.path.split(path)
+        self.add_entry(self.directory_id(directory), name, size, mtime, ctime, inode)
+
+    def add_directory(self, directory, files):
+        """Append the (name, size, mtime, ctime, inode) entries of one directory."""
+        dir_id, total = self.directory_id(directory), 0
+        for name, size, mtime, ctime, inode in files:
+            self.add_entry(dir_id, name, size, mtime, ctime, inode)
+            total += size
+        self.directories[directory] = (total, len(files))
+
+    def track_rows(self):
+        """Start keeping a path -> row map, so files can be updated and removed by path."""
+        if self._rows is None:
+            self._rows = {path: row for row, path in enumerate(self.iter_paths())}
+
+    def set_file(self, path, size, mtime, ctime, inode):
+        """Add a file, or update the row already holding its path. Needs track_rows()."""
+        directory = os.path.dirname(path)
+        total, count = self.directories.get(directory, (0, 0))
+        row = self._rows.get(path)
+        if row is None:
+            self.add(path, size, mtime, ctime, inode)
+            self._name_index = None
+            count += 1
+        else:
+            total -= self.sizes[row]
+            self.sizes[row] = size
+            self.mtimes[row] = mtime
+            self.ctimes[row] = ctime
+            self.inodes[row] = inode
+        self.directories[directory] = (total + size, count)
+
+    def remove_file(self, path):
+        """Remove a file by path, moving the last row into its place. Needs track_rows()."""
+        row = self._rows.pop(path, None)
+        if row is None:
+            return
+        directory = os.path.dirname(path)
+        total, count = self.directories.get(directory, (0, 1))
+        self.directories[directory] = (total - self.sizes[row], count - 1)
+        # The name bytes of the removed row stay in the buffer unused
+        last = len(self) - 1
+        columns = (self.dir_ids, self._name_starts, self._name_lengths, self.sizes, self.mtimes, self.ctimes,
+                   self.inodes, self.ext_codes)
+        if row != last:
+            for column in columns:
+                column[row] = column[last]
+            self._rows[self.path(row)] = row
+        for column in columns:
+            column.pop()
+        self._name_index = None
+
+    def remove_subtree(self, directory):
+        """Remove a directory and every file below it. Needs track_rows()."""
+        prefix = directory.rstrip(os.sep) + os.sep
+        for path in [path for path in self._rows if path.startswith(prefix)]:
+            self.remove_file(path)
+        for path in [path for path in self.directories if path == directory or path.startswith(prefix)]:
+            del self.directories[path]
+
+    def extension_code(self, extension):
+        """Return the small integer standing for an extension, registering it if new."""
+        code = self._ext_lookup.get(extension)
+        if code is None:
+            code = self._ext_lookup[extension] = len(self.extensions)
+            self.extensions.append(extension)
+        return code
+
+    def extension(self, row):
+        return self.extensions[self.ext_codes[row]]
+
+    def name_index(self):
+        """
+        Map every lowercase three-character sequence of a file name to the rows
+        whose name contains it. Built on first use and kept with the table.
+        """
+        if self._name_index is None:
+            index = {}
+            for row, name in enumerate(self.iter_names()):
+                name = name.lower()
+                for i in range(len(name) - 2):
+                    postings = index.get(name[i:i + 3])
+                    if postings is None:
+                        index[name[i:i + 3]] = array('I', [row])
+                    elif postings[-1] != row:
+                        postings.append(row)
+            self._name_index = index
+        return self._name_index
+
+    def find_by_name(self, phrase):
+        """Return the rows whose file name contains the phrase, ignoring case."""
+        phrase = phrase.lower()
+        if len(phrase) < 3:
+            return [row for row, name in enumerate(self.iter_names()) if phrase in name.lower()]
+        index = self.name_index()
+        postings = sorted((index.get(phrase[i:i + 3], ()) for i in range(len(phrase) - 2)), key=len)
+        candidates = set(postings[0])
+        for other in postings[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(other)
+        # Trigrams only narrow the search down; confirm the whole phrase
+        return [row for row in sorted(candidates) if phrase in self.name(row).lower()]
+
+    def records(self, rows=None):
+        """Yield (path, size) pairs for the given rows, or for all of them."""
+        for row in range(len(self)) if rows is None else rows:
+            yield self.path(row), self.sizes[row]
+
+def open_scan_index():
+    """Open the persistent scan index, creating its tables on first use."""
+    import sqlite3
+    connection = sqlite3.connect(scan_index_file)
+    if connection.execute("PRAGMA user_version").fetchone()[0] != scan_index_version:
+        connection.executescript("DROP TABLE IF EXISTS dirs; DROP TABLE IF EXISTS files;")
+        connection.execute(f"PRAGMA user_version = {scan_index_version}")
+    connection.executescript("""
+        CREATE TABLE IF NOT EXISTS dirs (
+            path BLOB PRIMARY KEY,
+            parent BLOB,
+            mtime_ns INTEGER,
+            rules TEXT
+        );
+        CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (parent);
+        CREATE TABLE IF NOT EXISTS files (
+            dir BLOB,
+            name BLOB,
+            size INTEGER,
+            mtime REAL,
+            ctime REAL,
+            inode INTEGER,
+            PRIMARY KEY (dir, name)
+        ) WITHOUT ROWID;
+    """)
+    return connection
+
+def subtree_bounds(directory):
+    """
+    Return the key range covering every path below a directory. Paths are kept
+    in the indexes as os.fsencode() bytes, so names that are not valid UTF-8
+    can be stored, and the bounds are bytes too.
+    """
+    separator = os.fsencode(os.sep)
+    prefix = os.fsencode(directory).rstrip(separator) + separator
+    return prefix, prefix[:-1] + bytes([separator[0] + 1])
+
+def forget_subtree(connection, directory):
+    """Drop a directory and everything below it from the scan index."""
+    low, high = subtree_bounds(directory)
+    key = os.fsencode(directory)
+    connection.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (key, low, high))
+    connection.execute("DELETE FROM files WHERE dir = ? OR (dir >= ? AND dir < ?)", (key, low, high))
+
+def glob_to_regex(pattern):
+    """
+    Translate one gitignore-style pattern into a regex over paths relative to
+    the scan root, using '/' as separator. Returns (regex, directories_only).
+    A pattern without a slash matches a name at any depth, one with a slash is
+    anchored at the root; '**' matches across directories and a trailing '/'
+    matches directories only.
+    """
+    import re
+    directories_only = pattern.endswith('/')
+    anchored = '/' in pattern.rstrip('/')
+    pattern = pattern.strip('/')
+    parts, i = [], 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            parts.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('**', i):
+            parts.append('.*')
+            i += 2
+        elif pattern[i] == '*':
+            parts.append('[^/]*')
+            i += 1
+        elif pattern[i] == '?':
+            parts.append('[^/]')
+            i += 1
+        elif pattern[i] == '[' and pattern.find(']', i + 2) != -1:
+            end = pattern.find(']', i + 2)
+            body = pattern[i + 1:end].replace('\\', '\\\\')
+            parts.append('[' + ('^' + body[1:] if body.startswith('!') else body) + ']')
+            i = end + 1
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    return ('' if anchored else '(?:.*/)?') + ''.join(parts), directories_only
+
+class ScanRules:
+    """
+    Exclude and include patterns compiled once for a scan root. Directories
+    that are excluded, or on another filesystem when one_filesystem is set,
+    are pruned while walking, so nothing below them is read. Include patterns
+    only select files; every directory that is not excluded is still walked.
+    """
+
+    def __init__(self, root, excludes=(), includes=(), one_filesystem=False):
+        import hashlib
+        import re
+        self.prefix = root.rstrip(os.sep) + os.sep
+        translated = [glob_to_regex(pattern) for pattern in excludes]
+        never = '(?!)'
+        self.excluded_dir = re.compile('(?:%s)$' % ('|'.join(regex for regex, _ in translated) or never)).match
+        self.excluded_file = re.compile('(?:%s)$' % ('|'.join(regex for regex, directories_only in translated
+                                                              if not directories_only) or never)).match
+        self.included_file = re.compile('(?:%s)$' % '|'.join(
+            glob_to_regex(pattern)[0] for pattern in includes)).match if includes else None
+        self.device = os.stat(root).st_dev if one_filesystem else None
+        # Scan index entries are only reused by scans with the same rules
+        self.signature = hashlib.sha1(repr((root, list(excludes), list(includes), one_filesystem)).encode(
+            'utf-8', 'surrogateescape')).hexdigest()[:16]
+
+    def relative(self, path):
+        relative = path[len(self.prefix):]
+        return relative if os.sep == '/' else relative.replace(os.sep, '/')
+
+    def keep_file(self, path):
+        relative = self.relative(path)
+        if self.excluded_file(relative):
+            return False
+        return self.included_file is None or self.included_file(relative) is not None
+
+    def keep_dir(self, path, entry=None):
+        if self.excluded_dir(self.relative(path)):
+            return False
+        if self.device is not None:
+            return (entry.stat() if entry is not None else os.stat(path)).st_dev == self.device
+        return True
+
+def current_scan_rules(root):
+    """Compile the configured exclude/include rules for a scan root, or return None if there are none."""
+    if not scan_excludes and not scan_includes and not one_filesystem:
+        return None
+    return ScanRules(os.path.abspath(root), scan_excludes, scan_includes, one_filesystem)
+
+def read_directory(directory, rules=None):
+    """Read one directory from disk, returning its files and the subdirectories to walk."""
+    files, subdirs = [], []
+    with log.span("stat", quiet=True), os.scandir(directory) as entries:
         for entry in entries:
-            if entry.is_file():
-                file_list.append((entry.path, os.path.getsize(entry.path)))
-            elif entry.is_dir():
-                list_files_recursive(entry.path, file_list)
+            try:
+                if entry.is_file():
+                    if rules is not None and not rules.keep_file(entry.path):
+                        continue
+                    stat = entry.stat()
+                    files.append((entry.name, stat.st_size, stat.st_mtime, stat.st_ctime, stat.st_ino))
+                elif entry.is_dir():
+                    if rules is not None and not rules.keep_dir(entry.path, entry):
+                        continue
+                    subdirs.append(entry.path)
+            except OSError:
+                continue
+    return files, subdirs
+
+def store_directory(connection, directory, mtime_ns, files, subdirs, signature=""):
+    """
+    Replace the indexed entries of a directory that was read from disk.
+    Every subdirectory gets a row right away, a placeholder without an mtime
+    until it is read itself, so one that could not be read is tried again by
+    the next scan even when this directory has not changed.
+    """
+    key = os.fsencode(directory)
+    old_subdirs = {os.fsdecode(row[0]) for row in connection.execute("SELECT path FROM dirs WHERE parent = ?", (key,))}
+    for removed in old_subdirs.difference(subdirs):
+        forget_subtree(connection, removed)
+    connection.execute("DELETE FROM files WHERE dir = ?", (key,))
+    connection.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                           [(key, os.fsencode(name), *rest) for name, *rest in files])
+    connection.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?)",
+                       (key, os.fsencode(os.path.dirname(directory)), mtime_ns, signature))
+    connection.executemany("INSERT OR IGNORE INTO dirs VALUES (?, ?, NULL, ?)",
+                           [(os.fsencode(subdir), key, signature) for subdir in subdirs])
+
+def walk_directories(root, visit, workers=None):
+    """
+    Walk a directory tree from a bounded thread pool.
+    visit(path) reads one directory and returns (result, subdirectories). Each
+    subdirectory becomes a task for whichever worker is free next, so deep trees
+    never hit the recursion limit and slow mounts are read by many threads at once.
+    Yields (path, result) as soon as each directory has been read.
+    """
+    results = queue.Queue()
+
+    def task(path):
+        # Anything visit raises must reach the consumer, or pending never drops and it waits forever
+        try:
+            results.put((path, visit(path), None))
+        except BaseException as e:
+            results.put((path, None, e))
+
+    from concurrent.futures import ThreadPoolExecutor
+    pool = ThreadPoolExecutor(max_workers=workers or scan_workers)
+    try:
+        pool.submit(task, root)
+        pending = 1
+        while pending:
+            path, outcome, error = results.get()
+            pending -= 1
+            if isinstance(error, OSError):
+                write_log(f"Skipped unreadable directory {path}: {error}")
+                continue
+            if error is not None:
+                raise error
+            result, subdirs = outcome
+            for subdir in subdirs:
+                pool.submit(task, subdir)
+            pending += len(subdirs)
+            yield path, result
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def walk_files(directory, workers=None):
+    """Yield (path, size) for every file below a directory, bypassing the scan index."""
+    rules = current_scan_rules(directory)
+    for path, files in walk_directories(directory, lambda path: read_directory(path, rules), workers):
+        for name, size, *_ in files:
+            yield os.path.join(path, name), size
+
+def indexed_walk(connection, root, workers=None, before_read=None, full_rescan=False):
+    """
+    Walk a tree through the persistent scan index, yielding (directory, files).
+    Only directories whose mtime changed since the last scan are read from disk
+    and stored in the index; for the others files is None and their entries
+    can be read with indexed_files. Files modified in place do not change
+    their directory's mtime, so sizes of such files are refreshed on the next
+    change of the directory that holds them, or by a full_rescan, which reads
+    every directory and stores it in the index again. before_read(path), if given, is
+    called from the worker thread before a directory is looked at.
+    Directories are stored with the signature of the exclude/include rules
+    they were read with, and are read again when the rules change.
+    """
+    global last_scan
+    rules = current_scan_rules(root)
+    signature = rules.signature if rules is not None else ""
+    low, high = subtree_bounds(root)
+    known_dirs, children = {}, {}
+    for path, parent, mtime_ns, rules_signature in connection.execute(
+            "SELECT path, parent, mtime_ns, rules FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+            (os.fsencode(root), low, high)):
+        path = os.fsdecode(path)
+        known_dirs[path] = (mtime_ns, rules_signature)
+        children.setdefault(os.fsdecode(parent), []).append(path)
+
+    def visit(path):
+        if before_read is not None:
+            before_read(path)
+        mtime_ns = os.stat(path).st_mtime_ns
+        if not full_rescan and known_dirs.get(path) == (mtime_ns, signature):
+            return None, children.get(path, [])
+        files, subdirs = read_directory(path, rules)
+        return (mtime_ns, files, subdirs), subdirs
+
+    for path, changed in walk_directories(root, visit, workers):
+        if changed is None:
+            yield path, None
+            continue
+        mtime_ns, files, subdirs = changed
+        store_directory(connection, path, mtime_ns, files, subdirs, signature)
+        last_scan = None  # The cached table no longer matches the index
+        yield path, files
+
+def indexed_files(connection, directory):
+    """Return the (name, size, mtime, ctime, inode) entries the scan index holds for a directory."""
+    return [(os.fsdecode(name), *rest) for name, *rest in connection.execute(
+        "SELECT name, size, mtime, ctime, inode FROM files WHERE dir = ?", (os.fsencode(directory),))]
+
+def iter_scanned_files(directory, workers=None, full_rescan=False):
+    """Yield (path, size, mtime, ctime, inode) for every file below a directory as the scan proceeds."""
+    root = os.path.abspath(directory)
+    if live_scan is not None and live_scan.root == root:
+        table = live_scan.sync()
+        for row in range(len(table)):
+            yield table.path(row), table.sizes[row], table.mtimes[row], table.ctimes[row], table.inodes[row]
+        return
+    connection = open_scan_index()
+    try:
+        for path, files in indexed_walk(connection, root, workers, full_rescan=full_rescan):
+            for name, size, mtime, ctime, inode in indexed_files(connection, path) if files is None else files:
+                yield os.path.join(path, name), size, mtime, ctime, inode
+        connection.commit()
+    finally:
+        connection.close()
+
+def scan_directory(directory, workers=None, before_read=None, full_rescan=False):
+    """
+    List files below a directory into a FileTable, using the persistent scan index.
+    If no directory changed since the previous scan of the same path, the table
+    of that scan (and its name index) is reused. In live mode the table kept
+    current by inotify is returned without walking the tree. With full_rescan
+    every directory is read from disk, see indexed_walk.
+    """
+    global last_scan
+    root = os.path.abspath(directory)
+    if live_scan is not None and live_scan.root == root and before_read is None:
+        return live_scan.sync()
+    connection = open_scan_index()
+    table, unchanged, rescanned = FileTable(), [], 0
+    with log.span("walk", root=root):
+        for path, files in indexed_walk(connection, root, workers, before_read, full_rescan):
+            if files is None:
+                unchanged.append(path)
+                continue
+            table.add_directory(path, files)
+            rescanned += 1
+
+        if rescanned == 0 and last_scan is not None and last_scan[0] == root:
+            table = last_scan[1]
+        else:
+            for path in unchanged:
+                table.add_directory(path, indexed_files(connection, path))
+        last_scan = (root, table)
+
+        connection.commit()
+        connection.close()
+    write_log(f"Scanned {root}: {len(table)} files, {rescanned} directories read from disk")
+    return table
 
-def save_results_to_file(files):
+class LiveScan:
+    """
+    Keep the FileTable of a directory current from inotify events (Linux only).
+    A background thread collects events as they arrive; sync() applies them to
+    the table before each query, so the tree is not walked again. When the
+    kernel event queue overflows and events are lost, the tree is rescanned.
+    """
+
+    def __init__(self, root, workers=None):
+        import threading
+        from inotify import Inotify
+        self.root = os.path.abspath(root)
+        self.workers = workers
+        self.inotify = Inotify()
+        self.watches = {}  # watch descriptor -> directory path
+        self.unwatched = 0  # directories left without a watch, e.g. over fs.inotify.max_user_watches
+        self.events = queue.Queue()
+        self.table = None
+        self.rules = None
+        self.rescan()
+        self.stopped = threading.Event()
+        self.reader = threading.Thread(target=self.read_events, daemon=True)
+        self.reader.start()
+
+    def watch(self, directory):
+        """Add a watch; called before the directory is read, so no change in between is missed."""
+        try:
+            self.watches[self.inotify.add_watch(directory)] = directory
+        except OSError as e:
+            self.unwatched += 1
+            write_log(f"Live mode cannot watch {directory}: {e}")
+
+    def read_events(self):
+        """Background thread: move events from the kernel into self.events."""
+        from inotify import IN_MODIFY
+        last = None
+        while not self.stopped.is_set():
+            batch = []
+            for event in self.inotify.read_events(timeout=0.5):
+                # A file being written sends IN_MODIFY for every write; one is enough
+                if event[1] & IN_MODIFY and event == last:
+                    continue
+                batch.append(event)
+                last = event
+            if batch:
+                self.events.put(batch)
+
+    def rescan(self, use_index=True):
+        """
+        Drop all watches and read the whole tree again, watching every directory.
+        Without use_index every directory is read and every file stat()ed again:
+        after lost events neither the scan index nor the cached table can be
+        trusted, because files written in place leave their directory's mtime alone.
+        """
+        global last_scan
+        for wd in list(self.watches):
+            self.inotify.remove_watch(wd)
+        self.watches.clear()
+        self.unwatched = 0
+        self.rules = current_scan_rules(self.root)
+        if use_index:
+            self.table = scan_directory(self.root, self.workers, before_read=self.watch)
+        else:
+            def visit(path):
+                self.watch(path)
+                return read_directory(path, self.rules)
+
+            last_scan = None
+            self.table = FileTable()
+            with log.span("walk", root=self.root):
+                for path, files in walk_directories(self.root, visit, self.workers):
+                    self.table.add_directory(path, files)
+        self.table.track_rows()
+
+    def add_subtree(self, directory):
+        """Watch and read a directory that appeared in the tree."""
+        def visit(path):
+            self.watch(path)
+            files, subdirs = read_directory(path, self.rules)
+            return files, subdirs
+
+        for path, files in walk_directories(directory, visit, self.workers):
+            self.table.directories.setdefault(path, (0, 0))
+            for name, size, mtime, ctime, inode in files:
+                self.table.set_file(os.path.join(path, name), size, mtime, ctime, inode)
+
+    def forget_subtree(self, directory):
+        """Stop watching a directory that left the tree and remove its files."""
+        prefix = directory + os.sep
+        for wd, path in list(self.watches.items()):
+            if path == directory or path.startswith(prefix):
+                self.inotify.remove_watch(wd)
+                del self.watches[wd]
+        self.table.remove_subtree(directory)
+
+    def refresh_file(self, path):
+        """Bring the row of one file in line with the disk."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stat = None
+        if stat is None or not stat_module.S_ISREG(stat.st_mode) or (
+                self.rules is not None and not self.rules.keep_file(path)):
+            self.table.remove_file(path)
+        else:
+            self.table.set_file(path, stat.st_size, stat.st_mtime, stat.st_ctime, stat.st_ino)
+
+    def sync(self):
+        """Apply the events received so far and return the current table."""
+        from inotify import IN_CREATE, IN_DELETE, IN_IGNORED, IN_ISDIR, IN_MOVED_FROM, IN_MOVED_TO, IN_Q_OVERFLOW
+        events = []
+        while True:
+            try:
+                events.extend(self.events.get_nowait())
+            except queue.Empty:
+                break
+        if any(mask & IN_Q_OVERFLOW for _, mask, _, _ in events):
+            write_log(f"Live mode lost events for {self.root}, rescanning")
+            self.rescan(use_index=False)
+            return self.table
+
+        # Files are stat()ed once after all events, however many events they got
+        changed = set()
+        for wd, mask, cookie, name in events:
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            directory = self.watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if not mask & IN_ISDIR:
+                changed.add(path)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self.forget_subtree(path)
+            elif mask & (IN_CREATE | IN_MOVED_TO):
+                try:
+                    if self.rules is not None and not self.rules.keep_dir(path):
+                        continue
+                except OSError:
+                    continue  # Gone again before it could be looked at
+                self.add_subtree(path)
+        for path in changed:
+            self.refresh_file(path)
+        if events:
+            write_log(f"Live mode applied {len(events)} events to {self.root}")
+        return self.table
+
+    def stop(self):
+        self.stopped.set()
+        self.reader.join()
+        self.inotify.close()
+
+def start_live_mode(directory):
+    """Turn on live mode for the mounted path."""
+    global live_scan
+    from inotify import load_libc
+    if load_libc() is None:
+        print(f"{COLORS['RED']}Live mode needs inotify, which is only available on Linux.{COLORS['RESET']}")
+        return
+    live_scan = LiveScan(directory, scan_workers)
+    print(f"Live mode on: watching {len(live_scan.watches)} directories, {len(live_scan.table)} files")
+    if live_scan.unwatched:
+        print(f"{COLORS['RED']}{live_scan.unwatched} directories could not be watched and may go stale; "
+              f"raise fs.inotify.max_user_watches to watch them all.{COLORS['RESET']}")
+    write_log(f"Live mode started for {live_scan.root}")
+
+def rescan_directory(directory):
+    """Read the mounted tree again ignoring the scan index, to pick up files rewritten in place."""
+    if directory is None:
+        print(f"{COLORS['RED']}No directory path set. Please set the path first.{COLORS['RESET']}")
+        return
+    if live_scan is not None:
+        live_scan.rescan(use_index=False)
+        table = live_scan.table
+    else:
+        table = scan_directory(directory, full_rescan=True)
+    print(f"Rescanned {directory}: {COLORS['GREEN']}{len(table)}{COLORS['RESET']} files")
+
+def stop_live_mode():
+    """Turn off live mode, if it is on."""
+    global live_scan
+    if live_scan is not None:
+        live_scan.stop()
+        write_log(f"Live mode stopped for {live_scan.root}")
+        live_scan = None
+
+def unique_result_file_name(extension):
+    """Generate a result file name that does not overwrite an earlier result from the same second."""
+    base_name = f"result_{current_formatted_time()}"
+    file_name, counter = f"{base_name}{extension}", 1
+    while os.path.exists(file_name):
+        file_name, counter = f"{base_name}_{counter}{extension}", counter + 1
+    return file_name
+
+class ResultWriter:
+    """
+    Stream result records into a file in one of OUTPUT_FORMATS.
+    Records go through a large write buffer and are written exactly once;
+    the binary format is the .blist format of list_format.py, which
+    list-actions.py reads without parsing lines.
+    """
+
+    def __init__(self, file_format=None, file_name=None, stream=None):
+        """Write to a new result file, or to an open binary stream such as sys.stdout.buffer."""
+        self.file_format = file_format or output_format
+        self.records_written = 0
+        self.bytes_written = 0
+        if stream is None:
+            self.file_name = file_name or unique_result_file_name(OUTPUT_FORMATS[self.file_format])
+            self._file = open(self.file_name, 'wb', buffering=1024 * 1024)
+        else:
+            self.file_name = None
+            self._file = stream
+        if self.file_format == "binary":
+            self._list = ListWriter(self._file)
+        elif self.file_format == "jsonl":
+            import json
+            self._dumps = json.dumps
+        elif self.file_format == "csv":
+            import csv
+            import io
+            self._csv_line = io.StringIO()
+            self._csv = csv.writer(self._csv_line)
+            self._write_csv(["path", "size", "mtime", "ctime"])
+
+    def _emit(self, data):
+        self._file.write(data)
+        self.bytes_written += len(data)
+
+    def _write_csv(self, values):
+        self._csv.writerow(values)
+        self._emit(self._csv_line.getvalue().encode('utf-8', 'surrogateescape'))
+        self._csv_line.seek(0)
+        self._csv_line.truncate()
+
+    def write(self, path, size, mtime, ctime, inode=0):
+        """Write one record."""
+        if self.file_format == "list":
+            line = f"{path} - {get_file_size_in_mb(size):.2f} MB - Created: {format_timestamp(ctime)}\n"
+            self._emit(line.encode('utf-8', 'surrogateescape'))
+        elif self.file_format == "jsonl":
+            line = self._dumps({"path": path, "size": size, "mtime": mtime, "ctime": ctime}) + "\n"
+            self._emit(line.encode('utf-8'))
+        elif self.file_format == "csv":
+            self._write_csv([path, size, mtime, ctime])
+        else:
+            self._list.add(path, size, mtime, ctime, inode)
+        self.records_written += 1
+
+    def write_row(self, table, row):
+        """Write one row of the file table."""
+        self.write(table.path(row), table.sizes[row], table.mtimes[row], table.ctimes[row], table.inodes[row])
+
+    def close(self):
+        """Flush the buffer and report what was written."""
+        if self.file_format == "binary":
+            self._list.close()
+            self.bytes_written = self._list.bytes_written
+        if self.file_name is None:
+            self._file.flush()
+            return
+        self._file.close()
+        print(f"Saved {COLORS['GREEN']}{self.records_written}{COLORS['RESET']} records "
+              f"({self.bytes_written / 1024:.1f} KB) to {COLORS['GREEN']}{self.file_name}{COLORS['RESET']}")
+        write_log(f"Saved {self.records_written} records ({self.bytes_written} bytes) to {self.file_name}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def list_file_records(file_name):
+    """Yield the (path, size, mtime, ctime, inode) records of a binary result list."""
+    with ListReader(file_name) as reader:
+        yield from reader
+
+def load_list_file(file_name):
+    """Load a binary result list into a FileTable, e.g. to sort or filter an earlier result again."""
+    table = FileTable()
+    for record in list_file_records(file_name):
+        table.add(*record)
+    return table
+
+def save_results_to_file(table, rows):
     """Save the sorted and filtered files to a file with a generated name."""
-    result_file_name = f"result_{current_formatted_time()}.list"
-    with open(result_file_name, 'w') as result_file:
-        for file_path, size in files:
-            size_mb = get_file_size_in_mb(size)
-            creation_time = get_file_creation_time(file_path)
-            result_file.write(f"{file_path} - {size_mb:.2f} MB - Created: {creation_time}\n")
+    with ResultWriter() as writer:
+        for row in rows:
+            writer.write_row(table, row)
+
+def get_output_format():
+    """Ask the user for the format of saved result files."""
+    formats = list(OUTPUT_FORMATS)
+    print(f"Current result file format: {COLORS['GREEN']}{output_format}{COLORS['RESET']}")
+    for i, file_format in enumerate(formats, 1):
+        print(f"{COLORS['GREEN']}({i}){COLORS['RESET']} {file_format} ({OUTPUT_FORMATS[file_format]})")
+    choice = input(f"Choice (1-{len(formats)}): ").strip()
+    if choice.isdigit() and 1 <= int(choice) <= len(formats):
+        return formats[int(choice) - 1]
+    print(f"{COLORS['RED']}Invalid choice. Keeping {output_format}.{COLORS['RESET']}")
+    return output_format
     
 
 def get_time_frame():
@@ -97,11 +919,69 @@ def get_time_frame():
     return start_date, end_date, False
 
 
-def get_file_creation_time(file_path):
-    """Pobierz czas utworzenia pliku."""
-    timestamp = os.path.getctime(file_path)
+def format_timestamp(timestamp):
+    """Format a stat timestamp for display."""
     return datetime.datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
 
+def format_file_row(table, row, colored=True):
+    """Format one row of the file table as a result line."""
+    size_mb = get_file_size_in_mb(table.sizes[row])
+    creation_time = format_timestamp(table.ctimes[row])
+    if not colored:
+        return f"{table.path(row)} - {size_mb:.2f} MB - Created: {creation_time}"
+    return f"{table.path(row)} - {COLORS['GREEN']}{size_mb:.2f} MB {COLORS['RESET']} - Created: {COLORS['GREEN']}{creation_time}{COLORS['RESET']}"
+
+def get_page_size():
+    """Number of result lines that fit in the terminal above the pager prompt."""
+    import shutil
+    return max(5, shutil.get_terminal_size().lines - 2)
+
+def find_in_results(table, rows, phrase, start):
+    """Return the position of the first row from start on (wrapping around) whose path contains the phrase."""
+    from itertools import chain
+    for position in chain(range(start, len(rows)), range(0, min(start, len(rows)))):
+        if phrase in table.path(rows[position]).lower():
+            return position
+    return None
+
+def show_results(table, rows, colored=True):
+    """
+    Show result rows one terminal page at a time. Only the rows of the page
+    being shown are formatted, so quitting early skips formatting the rest.
+    """
+    page_size = get_page_size()
+    pages = max(1, -(-len(rows) // page_size))
+    page, phrase = 0, None
+    while True:
+        start = page * page_size
+        with log.span("render", quiet=True):
+            lines = [format_file_row(table, row, colored) for row in rows[start:start + page_size]]
+        print("\n".join(lines))
+        if pages == 1:
+            return
+        command = input(f"Page {page + 1}/{pages} ({len(rows)} files) - Enter: next, p: previous, "
+                        f"<number>: go to page, /text: search, q: quit: ").strip()
+        if command == 'q':
+            return
+        elif command in ('', 'n'):
+            if page + 1 == pages:
+                return
+            page += 1
+        elif command == 'p':
+            page = max(0, page - 1)
+        elif command.isdigit() and 1 <= int(command) <= pages:
+            page = int(command) - 1
+        elif command.startswith('/'):
+            # A bare '/' repeats the previous search from the next page on
+            phrase = command[1:].strip().lower() or phrase
+            position = find_in_results(table, rows, phrase, start + page_size) if phrase else None
+            if position is None:
+                print(f"{COLORS['RED']}No result matches '{phrase or ''}'.{COLORS['RESET']}")
+            else:
+                page = position // page_size
+        else:
+            print(f"{COLORS['RED']}Invalid choice. Please try again.{COLORS['RESET']}")
+
 def get_file_size_in_mb(size_in_bytes):
     """Konwertuje rozmiar pliku na megabajty."""
     return size_in_bytes / (1024 * 1024)
@@ -124,11 +1004,6 @@ def get_user_sort_choice():
         else:
             print(f"{COLORS['RED']}Invalid choice. Please try again.{COLORS['RESET']}")
 
-def get_file_modification_time(file_path):
-    """Pobierz czas ostatniej modyfikacji pliku."""
-    timestamp = os.path.getmtime(file_path)
-    return datetime.datetime.fromtimestamp(timestamp)
-
 def get_directory_path():
     """Pobiera od użytkownika ścieżkę do katalogu i weryfikuje jej poprawność."""
     while True:
@@ -143,187 +1018,205 @@ def get_extension():
     extension = input(f"Enter the file extension to filter {COLORS['RED']}(e.g., '.txt') or leave blank {COLORS['RESET']}: ").strip()
     return extension if extension else None
 
+def parse_size_filter(size_filter_input):
+    """Split a size filter such as '> 50' or '<100' into its operator and limit in MB."""
+    operator, size_limit = size_filter_input[:1], size_filter_input[1:].strip()
+    if operator not in ('>', '<'):
+        raise ValueError(f"Invalid size filter: {size_filter_input}")
+    return operator, float(size_limit)
+
 def get_size_filter():
     """Get the user's input for filtering files by size."""
     size_filter_input = input(f"Enter file size filter {COLORS['RED']}(e.g., '> 50', '< 100', or leave blank){COLORS['RESET']}: ").strip()
     if size_filter_input:
         try:
-            operator, size_limit = size_filter_input.split()
-            size_limit = float(size_limit)
-            return operator, size_limit
+            return parse_size_filter(size_filter_input)
         except ValueError:
             print(f"Invalid format. Use '{COLORS['RED']}> MB'{COLORS['RESET']} or '{COLORS['RED']}< MB{COLORS['RESET']}'.")
             return None, None
     return None, None
 
-def filter_files_by_date(files, start_date, end_date):
-    """Filtruj pliki według daty modyfikacji."""
-    if not start_date and not end_date:
-        return files
-    filtered_files = []
-    for file in files:
-        mod_time = get_file_modification_time(file[0])
-        if (start_date and mod_time < start_date) or (end_date and mod_time > end_date):
-            continue
-        filtered_files.append(file)
-    return filtered_files
-
-def filter_files_by_extension(files, extension):
-    """Filtruj pliki według rozszerzenia."""
-    if not extension:
-        return files
-    return [file for file in files if file[0].endswith(extension)]
-
-
-def list_by_size(directory):
-    """List files in the directory sorted by size, display size in MB, and creation time."""
-    
-    if global_directory_path is None:
-        print(f"{COLORS['RED']}No directory path set. Please set the path first.{COLORS['RESET']}")
-        return
-    
-    sort_choice = get_user_sort_choice()
-    if sort_choice is None or sort_choice == 'back':
-        return  # Return to menu if the user chose to go back
-
-    sort_ascending = sort_choice
-    start_date, end_date, back_flag = get_time_frame()
-    if back_flag:
-        return  # Return to menu if the user chose to go back
-
-    extension_filter = get_extension()
-    if extension_filter == 'back':
-        return  # Return to menu if the user chose to go back
-
-    size_operator, size_limit = get_size_filter()
-    if size_operator == 'back':
-        return  # Return to menu if the user chose to go back
-
-    files = []
-    list_files_recursive(directory, files)
-
-    # Filtering files based on time frame, extension, and size
-    if start_date and end_date:
-        files = [file for file in files if start_date <= get_file_modification_time(file[0]) <= end_date]
-    if extension_filter:
-        files = [file for file in files if file[0].endswith(extension_filter)]
-    if size_operator and size_limit:
-        if size_operator == '>':
-            files = [file for file in files if get_file_size_in_mb(file[1]) > size_limit]
-        elif size_operator == '<':
-            files = [file for file in files if get_file_size_in_mb(file[1]) < size_limit]
-
-    # Sort the files by size
-    files.sort(key=lambda x: x[1], reverse=not sort_ascending)
-
-    # Display the sorted and filtered files
-    for file_path, size in files:
-        size_mb = get_file_size_in_mb(size)
-        creation_time = get_file_creation_time(file_path)
-        print(f"{file_path} - {COLORS['GREEN']}{size_mb:.2f} MB {COLORS['RESET']} - Created: {COLORS['GREEN']}{creation_time}{COLORS['RESET']}")
-        save_results_to_file(files)
-
-def list_by_date(directory):
-    
-    if global_directory_path is None:
-        print(f"{COLORS['RED']}No directory path set. Please set the path first.{COLORS['RESET']}")
-        return
-    
-    
-    sort_choice = get_user_sort_choice()
-    if sort_choice is None or sort_choice == 'back':
-        return  # Return to menu if the user chose to go back
-
-    sort_ascending = sort_choice
-    start_date, end_date, back_flag = get_time_frame()
-    if back_flag:
-        return  # Return to menu if the user chose to go back
-
-    extension_filter = get_extension()
-    if extension_filter == 'back':
-        return  # Return to menu if the user chose to go back
-
-    size_operator, size_limit = get_size_filter()
-    if size_operator == 'back':
-        return  # Return to menu if the user chose to go back
-
-    files = []
-    list_files_recursive(directory, files)
-
-    # Filtering files based on time frame, extension, and size
-    if start_date and end_date:
-        files = [file for file in files if start_date <= get_file_modification_time(file[0]) <= end_date]
-    if extension_filter:
-        files = [file for file in files if file[0].endswith(extension_filter)]
-    if size_operator and size_limit:
-        if size_operator == '>':
-            files = [file for file in files if get_file_size_in_mb(file[1]) > size_limit]
-        elif size_operator == '<':
-            files = [file for file in files if get_file_size_in_mb(file[1]) < size_limit]
-
-    # Sort the files by date
-    files.sort(key=lambda x: get_file_modification_time(x[0]), reverse=not sort_ascending)
-
-    # Display the sorted and filtered files
-    for file_path, size in files:
-        size_mb = get_file_size_in_mb(size)
-        creation_time = get_file_creation_time(file_path)
-        print(f"{file_path} - {COLORS['GREEN']}{size_mb:.2f} MB {COLORS['RESET']} - Created: {COLORS['GREEN']}{creation_time}{COLORS['RESET']}")
-        save_results_to_file(files)
-
-def list_by_extension(directory):
-    if global_directory_path is None:
-        print(f"{COLORS['RED']}No directory path set. Please set the path first.{COLORS['RESET']}")
-        return
-    
-    sort_choice = get_user_sort_choice()
-    if sort_choice is None or sort_choice == 'back':
-        return  # Return to menu if the user chose to go back
-
-    sort_ascending = sort_choice
-    start_date, end_date, back_flag = get_time_frame()
-    if back_flag:
-        return  # Return to menu if the user chose to go back
-
-    extension_filter = get_extension()
-    if extension_filter == 'back':
-        return  # Return to menu if the user chose to go back
-
-    size_operator, size_limit = get_size_filter()
-    if size_operator == 'back':
-        return  # Return to menu if the user chose to go back
-
-    files = []
-    list_files_recursive(directory, files)
+def load_numpy():
+    """Return the numpy module, or None when it is not installed."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
 
-    # Filtering files based on time frame, extension, and size
-    if start_date and end_date:
-        files = [file for file in files if start_date <= get_file_modification_time(file[0]) <= end_date]
-    if extension_filter:
-        files = [file for file in files if file[0].endswith(extension_filter)]
-    if size_operator and size_limit:
-        if size_operator == '>':
-            files = [file for file in files if get_file_size_in_mb(file[1]) > size_limit]
-        elif size_operator == '<':
-            files = [file for file in files if get_file_size_in_mb(file[1]) < size_limit]
+def is_plain_extension(extension):
+    """True for filters like '.txt' that can be matched against the extension column."""
+    return extension.startswith('.') and extension.count('.') == 1
 
-    # Sort the files by extension
-    files.sort(key=lambda x: x[0].split('.')[-1], reverse=not sort_ascending)
+def matching_extension_codes(table, extension):
+    """Codes of every extension in the table that ends with the filter."""
+    return [code for code, known in enumerate(table.extensions) if known.endswith(extension)]
 
-    # Display the sorted and filtered files
-    for file_path, size in files:
-        size_mb = get_file_size_in_mb(size)
-        creation_time = get_file_creation_time(file_path)
-        print(f"{file_path} - {COLORS['GREEN']}{size_mb:.2f} MB {COLORS['RESET']} - Created: {COLORS['GREEN']}{creation_time}{COLORS['RESET']}")
-        save_results_to_file(files)
+def filter_files_by_date(table, rows, start_date, end_date):
+    """Filtruj pliki według daty modyfikacji (end_date wyłącznie)."""
+    if not start_date and not end_date:
+        return rows
+    start = start_date.timestamp() if start_date else float('-inf')
+    end = end_date.timestamp() if end_date else float('inf')
+    mtimes = table.mtimes
+    return [row for row in rows if start <= mtimes[row] < end]
 
+def filter_files_by_extension(table, rows, extension):
+    """Filtruj pliki według rozszerzenia."""
+    if not extension:
+        return rows
+    if is_plain_extension(extension):
+        codes = set(matching_extension_codes(table, extension))
+        return [row for row in rows if table.ext_codes[row] in codes]
+    return [row for row in rows if table.name(row).endswith(extension)]
+
+def filter_files_by_size(table, rows, size_operator, size_limit):
+    """Filter files by size in MB."""
+    if not size_operator or not size_limit:
+        return rows
+    sizes = table.sizes
+    if size_operator == '>':
+        return [row for row in rows if get_file_size_in_mb(sizes[row]) > size_limit]
+    elif size_operator == '<':
+        return [row for row in rows if get_file_size_in_mb(sizes[row]) < size_limit]
+    return rows
+
+def sort_key_values(table, rows, key):
+    """Return per-row values that order the rows by the given key."""
+    if key == 'size':
+        return [table.sizes[row] for row in rows]
+    if key == 'date':
+        return [table.mtimes[row] for row in rows]
+    if key == 'extension':
+        return [table.extension(row) for row in rows]
+    if key == 'name':
+        return [table.name(row) for row in rows]
+    raise ValueError(f"Unknown sort key: {key}")
+
+def query_files_python(table, start_date, end_date, extension, size_operator, size_limit, order_by):
+    """Pure Python version of query_files, used when NumPy is not installed."""
+    with log.span("filter", rows=len(table)):
+        rows = range(len(table))
+        rows = filter_files_by_date(table, rows, start_date, end_date)
+        rows = filter_files_by_extension(table, rows, extension)
+        rows = list(filter_files_by_size(table, rows, size_operator, size_limit))
+    with log.span("sort", rows=len(rows)):
+        # Stable sorts from the least to the most significant key
+        for key, ascending in reversed(order_by):
+            values = dict(zip(rows, sort_key_values(table, rows, key)))
+            rows.sort(key=values.__getitem__, reverse=not ascending)
+    return rows
+
+def query_files_numpy(np, table, start_date, end_date, extension, size_operator, size_limit, order_by):
+    """Evaluate the filters as boolean masks over the table columns and sort with lexsort."""
+    sizes = np.frombuffer(table.sizes, dtype=np.int64)
+    mtimes = np.frombuffer(table.mtimes, dtype=np.float64)
+    with log.span("filter", rows=len(table)):
+        mask = np.ones(len(table), dtype=bool)
+        if start_date:
+            mask &= mtimes >= start_date.timestamp()
+        if end_date:
+            mask &= mtimes < end_date.timestamp()
+        if extension:
+            if is_plain_extension(extension):
+                ext_codes = np.frombuffer(table.ext_codes, dtype=np.uint32)
+                mask &= np.isin(ext_codes, matching_extension_codes(table, extension))
+            else:
+                mask &= np.fromiter((name.endswith(extension) for name in table.iter_names()), dtype=bool,
+                                    count=len(table))
+        if size_operator and size_limit:
+            limit = size_limit * 1024 * 1024
+            if size_operator == '>':
+                mask &= sizes > limit
+            elif size_operator == '<':
+                mask &= sizes < limit
+        rows = np.flatnonzero(mask)
+
+    with log.span("sort", rows=len(rows)):
+        sort_keys = []
+        for key, ascending in order_by:
+            if key == 'size':
+                values = sizes[rows]
+            elif key == 'date':
+                values = mtimes[rows]
+            else:
+                # Strings are replaced by their rank among the distinct values
+                strings = sort_key_values(table, rows, key)
+                ranks = {value: rank for rank, value in enumerate(sorted(set(strings)))}
+                values = np.fromiter((ranks[value] for value in strings), dtype=np.int64, count=len(strings))
+            sort_keys.append(values if ascending else -values)
+        if sort_keys:
+            # lexsort treats its last key as the primary one
+            rows = rows[np.lexsort(sort_keys[::-1])]
+    return rows.tolist()
+
+def query_files(table, start_date=None, end_date=None, extension=None, size_operator=None, size_limit=None, order_by=()):
+    """
+    Filter and sort the file table, returning the matching rows in order.
+    order_by is a sequence of (key, ascending) pairs, most significant first,
+    with keys 'size', 'date', 'extension' and 'name'. Files modified at or
+    after end_date are left out.
+    """
+    np = load_numpy() if len(table) >= numpy_min_rows else None
+    if np is None:
+        return query_files_python(table, start_date, end_date, extension, size_operator, size_limit, order_by)
+    return query_files_numpy(np, table, start_date, end_date, extension, size_operator, size_limit, order_by)
 
-import os
 
-def list_by_alphabetical(directory, size_operator=None, size_limit=None):
+def record_filter(start_date, end_date, extension, size_operator, size_limit):
+    """
+    Build a predicate applying the listing filters to one (path, size, mtime, ...) record.
+    Like query_files, end_date is exclusive.
     """
-    Lists files in the specified directory alphabetically.
-    Optionally filters files by size and modification date.
+    start = start_date.timestamp() if start_date else float('-inf')
+    end = end_date.timestamp() if end_date else float('inf')
+    min_size = size_limit * 1024 * 1024 if size_operator == '>' and size_limit else float('-inf')
+    max_size = size_limit * 1024 * 1024 if size_operator == '<' and size_limit else float('inf')
+
+    def matches(record):
+        path, size, mtime = record[:3]
+        return (start <= mtime < end and min_size < size < max_size
+                and (not extension or path.endswith(extension)))
+    return matches
+
+def top_files(records, count, key, largest=True, on_progress=None):
+    """
+    Return the `count` largest (or smallest) records of a stream by size or date, best first.
+    Only a heap of `count` records is kept, so memory does not grow with the
+    number of files. on_progress(seen, leader) is called every 10000 records.
+    """
+    import heapq
+    column = 1 if key == 'size' else 2
+    sign = 1 if largest else -1
+    heap = []
+    for seen, record in enumerate(records, 1):
+        # Earlier records win ties
+        item = (sign * record[column], -seen, record)
+        if len(heap) < count:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+        if on_progress and seen % 10000 == 0:
+            on_progress(seen, max(heap)[2])
+    return [record for _, _, record in sorted(heap, reverse=True)]
+
+def get_top_count():
+    """Ask how many files to show; None means all of them."""
+    count = input(f"Show only the top N files {COLORS['RED']}(enter N or leave blank for all){COLORS['RESET']}: ").strip()
+    if count.isdigit() and int(count) > 0:
+        return int(count)
+    if count:
+        print(f"{COLORS['RED']}Invalid number. Showing all files.{COLORS['RESET']}")
+    return None
+
+def show_scan_progress(seen, leader):
+    """Print the number of files seen so far and the current leader on one line."""
+    print(f"\r{seen} files scanned, current #1: {leader[0]}"[:200], end='', flush=True)
+
+def list_sorted_files(directory, sort_key):
+    """
+    Ask for the sort order and filters, then list the files sorted by the given key.
+    Files that compare equal are listed by name.
     """
 
     # Check if global directory path is set
@@ -353,29 +1246,47 @@ def list_by_alphabetical(directory, size_operator=None, size_limit=None):
     if size_operator == 'back':
         return  # Return to menu if the user chose to go back
 
-    files = []
-    list_files_recursive(directory, files)
+    top_count = get_top_count() if sort_key in ('size', 'date') else None
+
+    if top_count:
+        # Stream the walk through a bounded heap instead of sorting every file
+        matches = record_filter(start_date, end_date, extension_filter, size_operator, size_limit)
+        records = filter(matches, iter_scanned_files(directory))
+        with log.span("walk", root=directory, top=top_count):
+            best = top_files(records, top_count, sort_key, largest=not sort_ascending,
+                             on_progress=show_scan_progress)
+        print()
+        table = FileTable()
+        for record in best:
+            table.add(*record)
+        rows = range(len(table))
+    else:
+        table = scan_directory(directory)
+        order_by = [(sort_key, sort_ascending)]
+        if sort_key != 'name':
+            order_by.append(('name', True))
+        rows = query_files(table, start_date, end_date, extension_filter, size_operator, size_limit, order_by)
 
-    # Filtering files based on time frame, extension, and size
-    if start_date and end_date:
-        files = [file for file in files if start_date <= get_file_modification_time(file[0]) <= end_date]
-    if extension_filter:
-        files = [file for file in files if file[0].endswith(extension_filter)]
-    if size_operator and size_limit:
-        if size_operator == '>':
-            files = [file for file in files if get_file_size_in_mb(file[1]) > size_limit]
-        elif size_operator == '<':
-            files = [file for file in files if get_file_size_in_mb(file[1]) < size_limit]
+    # Save every result, then let the user page through them
+    with log.span("render", rows=len(rows)):
+        save_results_to_file(table, rows)
+    show_results(table, rows)
 
-    # Sort the files alphabetically
-    files.sort(key=lambda x: os.path.basename(x[0]), reverse=not sort_ascending)
+def list_by_size(directory):
+    """List files in the directory sorted by size, display size in MB, and creation time."""
+    list_sorted_files(directory, 'size')
 
-    # Display the sorted and filtered files
-    for file_path, size in files:
-        size_mb = get_file_size_in_mb(size)
-        creation_time = get_file_creation_time(file_path)
-        print(f"{file_path} - {COLORS['GREEN']}{size_mb:.2f} MB {COLORS['RESET']} - Created: {COLORS['GREEN']}{creation_time}{COLORS['RESET']}")
-        save_results_to_file(files)
+def list_by_date(directory):
+    """List files in the directory sorted by modification date."""
+    list_sorted_files(directory, 'date')
+
+def list_by_extension(directory):
+    """List files in the directory sorted by extension."""
+    list_sorted_files(directory, 'extension')
+
+def list_by_alphabetical(directory):
+    """Lists files in the specified directory alphabetically."""
+    list_sorted_files(directory, 'name')
 
 
 def list_by_phrase_in_name(directory):
@@ -391,38 +1302,247 @@ def list_by_phrase_in_name(directory):
     # Get phrase to search in file names
     phrase = input(f"Enter the {COLORS['RED']}phrase{COLORS['RESET']} to search in file names: ").strip().lower()
 
-    files = []
-    list_files_recursive(directory, files)
+    table = scan_directory(directory)
 
     # Filter files containing the phrase in their name
-    filtered_files = [file for file in files if phrase in os.path.basename(file[0]).lower()]
+    rows = table.find_by_name(phrase)
 
     # Get user's choice for sorting order
     sort_choice = get_user_sort_choice()
     if sort_choice is None or sort_choice == 'back':
         return  # Return to menu if the user chose to go back
 
-    sort_ascending = sort_choice 
+    sort_ascending = sort_choice
    # Sort the filtered files alphabetically
-    filtered_files.sort(key=lambda x: os.path.basename(x[0]), reverse=not sort_ascending)
+    with log.span("sort", rows=len(rows)):
+        rows.sort(key=table.name, reverse=not sort_ascending)
 
     # Display the sorted and filtered files
-    for file_path, size in filtered_files:
-        size_mb = get_file_size_in_mb(size)
-        creation_time = get_file_creation_time(file_path)
-        print(f"{file_path} - {COLORS['GREEN']}{size_mb:.2f} MB {COLORS['RESET']} - Created: {COLORS['GREEN']}{creation_time}{COLORS['RESET']}")
+    show_results(table, rows)
+
 
+def lower_text(data):
+    """
+    Lowercase a chunk of text bytes. ASCII is lowered byte by byte; other
+    text is lowered as UTF-8 like str.lower(), so b'\xc5\xbb' (Ż) becomes
+    b'\xc5\xbc' (ż). Bytes that are not UTF-8 are kept as they are.
+    """
+    if data.isascii():
+        return data.lower()
+    return data.decode('utf-8', 'surrogateescape').lower().encode('utf-8', 'surrogateescape')
+
+def file_contains_phrase(file_path, phrase):
+    """
+    Check whether a file contains a phrase (lowercase UTF-8 bytes), ignoring case.
+    The file is memory-mapped and searched in chunks of search_chunk_size;
+    chunks overlap so matches crossing a chunk border are found. An ASCII
+    phrase is matched on bytes.lower(); any other phrase on lower_text(), and
+    chunks holding only ASCII are skipped for it. Files with a NUL byte near
+    the start are binary and skipped.
+    """
+    with open(file_path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0 or not phrase:
+            return False
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if b"\0" in data[:8192]:
+                return False
+            if phrase.isascii():
+                overlap = len(phrase) - 1
+                for start in range(0, size, search_chunk_size):
+                    if phrase in data[start:start + search_chunk_size + overlap].lower():
+                        return True
+                return False
+            # The uppercase form of a phrase can take more bytes than the lowercase one (ẞ and ß)
+            overlap = 2 * len(phrase)
+            for start in range(0, size, search_chunk_size):
+                chunk = data[start:start + search_chunk_size + overlap]
+                if not chunk.isascii() and phrase in lower_text(chunk):
+                    return True
+    return False
+
+def search_file_worker(task):
+    """Process pool entry point: search one file and report (row, found, error)."""
+    row, file_path, phrase = task
+    try:
+        return row, file_contains_phrase(file_path, phrase), None
+    except (OSError, ValueError) as e:
+        return row, False, str(e)
+
+def search_content(table, rows, phrase):
+    """Search the given rows for a phrase on a process pool, yielding matching rows as they are found."""
+    import multiprocessing
+    phrase = phrase.lower().encode('utf-8')
+    tasks = ((row, table.path(row), phrase) for row in rows)
+    with multiprocessing.Pool(search_workers) as pool:
+        for row, found, error in pool.imap_unordered(search_file_worker, tasks, chunksize=16):
+            if error:
+                print(f"Error reading {table.path(row)}: {error}")
+                write_log(f"Error reading {table.path(row)}: {error}")
+            elif found:
+                yield row
+
+def open_content_index():
+    """Open the trigram content index, creating its tables on first use."""
+    import sqlite3
+    connection = sqlite3.connect(content_index_file)
+    if connection.execute("PRAGMA user_version").fetchone()[0] != content_index_version:
+        connection.executescript("DROP TABLE IF EXISTS roots; DROP TABLE IF EXISTS docs; DROP TABLE IF EXISTS postings;")
+        connection.execute(f"PRAGMA user_version = {content_index_version}")
+    connection.executescript("""
+        CREATE TABLE IF NOT EXISTS roots (path BLOB PRIMARY KEY);
+        CREATE TABLE IF NOT EXISTS docs (
+            id INTEGER PRIMARY KEY,
+            path BLOB UNIQUE,
+            size INTEGER,
+            mtime REAL,
+            state INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS postings (
+            trigram INTEGER,
+            doc INTEGER,
+            PRIMARY KEY (trigram, doc)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc);
+    """)
+    return connection
+
+# Content index document states; too large and unreadable files are always search candidates
+DOC_INDEXED, DOC_TOO_LARGE, DOC_BINARY, DOC_UNREADABLE = 0, 1, 2, 3
+
+def text_trigrams(data):
+    """Return every three-byte sequence of the data as an integer."""
+    return {a << 16 | b << 8 | c for a, b, c in zip(data, data[1:], data[2:])}
+
+def file_trigrams(file_path):
+    """
+    Return the trigrams of a text file lowered by lower_text(), the way
+    searched phrases are, or None if the file is binary.
+    """
+    trigrams = set()
+    with open(file_path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            return trigrams
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if b"\0" in data[:8192]:
+                return None
+            # The overlap covers the characters of trigrams starting before the chunk border
+            for start in range(0, size, search_chunk_size):
+                trigrams |= text_trigrams(lower_text(data[start:start + search_chunk_size + 8]))
+    return trigrams
+
+def index_file_worker(task):
+    """Process pool entry point: collect the trigrams of one file."""
+    row, file_path = task
+    try:
+        return row, file_trigrams(file_path), None
+    except (OSError, ValueError) as e:
+        return row, None, str(e)
+
+def forget_indexed_document(connection, doc):
+    connection.execute("DELETE FROM postings WHERE doc = ?", (doc,))
+    connection.execute("DELETE FROM docs WHERE id = ?", (doc,))
+
+def update_content_index(table, directory):
+    """
+    Bring the content index of a directory up to date with its file table.
+    Only files that are new or whose size or mtime changed are read, and
+    files that could not be read last time. Returns the number of files read.
+    """
+    root = os.path.abspath(directory)
+    low, high = subtree_bounds(root)
+    connection = open_content_index()
+    connection.execute("INSERT OR IGNORE INTO roots VALUES (?)", (os.fsencode(root),))
+    indexed = {os.fsdecode(path): (doc, size, mtime, state) for doc, path, size, mtime, state in connection.execute(
+        "SELECT id, path, size, mtime, state FROM docs WHERE path >= ? AND path < ?", (low, high))}
+
+    to_read = []
+    for row, path in enumerate(table.iter_paths()):
+        known = indexed.pop(path, None)
+        if known and known[1] == table.sizes[row] and known[2] == table.mtimes[row] and known[3] != DOC_UNREADABLE:
+            continue
+        if known:
+            forget_indexed_document(connection, known[0])
+        if table.sizes[row] > content_index_max_size:
+            connection.execute("INSERT INTO docs (path, size, mtime, state) VALUES (?, ?, ?, ?)",
+                               (os.fsencode(path), table.sizes[row], table.mtimes[row], DOC_TOO_LARGE))
+        else:
+            to_read.append(row)
+    for doc, *_ in indexed.values():
+        forget_indexed_document(connection, doc)
+
+    import multiprocessing
+    tasks = ((row, table.path(row)) for row in to_read)
+    with multiprocessing.Pool(search_workers) as pool:
+        for row, trigrams, error in pool.imap_unordered(index_file_worker, tasks, chunksize=16):
+            if error:
+                # Kept as a candidate, so searches still try the file and report the error
+                write_log(f"Could not index {table.path(row)}: {error}")
+                connection.execute("INSERT INTO docs (path, size, mtime, state) VALUES (?, ?, ?, ?)",
+                                   (os.fsencode(table.path(row)), table.sizes[row], table.mtimes[row], DOC_UNREADABLE))
+                continue
+            cursor = connection.execute("INSERT INTO docs (path, size, mtime, state) VALUES (?, ?, ?, ?)",
+                                        (os.fsencode(table.path(row)), table.sizes[row], table.mtimes[row],
+                                         DOC_BINARY if trigrams is None else DOC_INDEXED))
+            if trigrams:
+                connection.executemany("INSERT INTO postings VALUES (?, ?)",
+                                       ((trigram, cursor.lastrowid) for trigram in trigrams))
+    connection.commit()
+    connection.close()
+    write_log(f"Content index of {root} updated: {len(to_read)} files read")
+    return len(to_read)
+
+def content_index_covers(directory):
+    """True if a content index was built for the directory or one of its parents."""
+    if not os.path.exists(content_index_file):
+        return False
+    root = os.path.abspath(directory)
+    connection = open_content_index()
+    roots = [os.fsdecode(row[0]) for row in connection.execute("SELECT path FROM roots")]
+    connection.close()
+    return any(root == indexed or os.fsencode(root).startswith(subtree_bounds(indexed)[0]) for indexed in roots)
+
+def content_index_candidates(directory, phrase):
+    """
+    Return the paths below a directory that may contain the phrase, or None
+    when the phrase is too short for the trigram index to narrow the search.
+    """
+    phrase = phrase.lower().encode('utf-8')
+    if len(phrase) < 3:
+        return None
+    root = os.path.abspath(directory)
+    low, high = subtree_bounds(root)
+    connection = open_content_index()
+    docs = None
+    for trigram in text_trigrams(phrase):
+        postings = {row[0] for row in connection.execute("SELECT doc FROM postings WHERE trigram = ?", (trigram,))}
+        docs = postings if docs is None else docs & postings
+        if not docs:
+            break
+    candidates = {os.fsdecode(path) for doc, path, state in connection.execute(
+        "SELECT id, path, state FROM docs WHERE path >= ? AND path < ?", (low, high))
+        if state in (DOC_TOO_LARGE, DOC_UNREADABLE) or doc in docs}
+    connection.close()
+    return candidates
+
+def build_content_index(directory):
+    """Build or refresh the content index for the mounted directory."""
+    if global_directory_path is None:
+        print(f"{COLORS['RED']}No directory path set. Please set the path first.{COLORS['RESET']}")
+        return
+    table = scan_directory(directory)
+    files_read = update_content_index(table, directory)
+    print(f"Content index updated: {COLORS['GREEN']}{files_read}{COLORS['RESET']} of {len(table)} files read.")
 
 def list_by_phrase_in_content(directory):
-    
+
     if global_directory_path is None:
         print(f"{COLORS['RED']}No directory path set. Please set the path first.{COLORS['RESET']}")
-        return    
+        return
 
     """List files containing a specified phrase in their content."""
     phrase = input(f"Enter the {COLORS['RED']}phrase{COLORS['RESET']} to search in file content: ").strip().lower()
-    files = []
-    list_files_recursive(directory, files)
 
     sort_choice = get_user_sort_choice()
     if sort_choice is None or sort_choice == 'back':
@@ -441,60 +1561,342 @@ def list_by_phrase_in_content(directory):
     if size_operator == 'back':
         return  # Return to menu if the user chose to go back
 
-    files = []
-    list_files_recursive(directory, files)
-
-    # Filtering files based on time frame, extension, and size
-    if start_date and end_date:
-        files = [file for file in files if start_date <= get_file_modification_time(file[0]) <= end_date]
-    if extension_filter:
-        files = [file for file in files if file[0].endswith(extension_filter)]
-    if size_operator and size_limit:
-        if size_operator == '>':
-            files = [file for file in files if get_file_size_in_mb(file[1]) > size_limit]
-        elif size_operator == '<':
-            files = [file for file in files if get_file_size_in_mb(file[1]) < size_limit]
-
-    # Filter files containing the phrase in their content
-    filtered_files = []
-    for file_path, size in files:
+    table = scan_directory(directory)
+    rows = query_files(table, start_date, end_date, extension_filter, size_operator, size_limit,
+                       order_by=[('name', sort_ascending)])
+
+    # Narrow the search down with the content index if one was built for this tree
+    if content_index_covers(directory):
+        update_content_index(table, directory)
+        candidates = content_index_candidates(directory, phrase)
+        if candidates is not None:
+            print(f"Content index narrowed the search to {len(candidates)} files.")
+            rows = [row for row in rows if table.path(row) in candidates]
+
+    # Filter files containing the phrase in their content, showing each match as it is found
+    filtered_rows = []
+    with log.span("filter", rows=len(rows), phrase=phrase):
+        for row in search_content(table, rows, phrase):
+            print(format_file_row(table, row, colored=False))
+            filtered_rows.append(row)
+
+    # Save the filtered files in the chosen order
+    position = {row: i for i, row in enumerate(rows)}
+    filtered_rows.sort(key=position.__getitem__)
+    with log.span("render", rows=len(filtered_rows)), ResultWriter() as writer:
+        for row in filtered_rows:
+            writer.write_row(table, row)
+
+def get_scan_workers():
+    """Ask the user for the number of scanner threads."""
+    workers = input(f"Enter the number of scanner threads {COLORS['RED']}(currently {scan_workers}){COLORS['RESET']}: ").strip()
+    if workers.isdigit() and int(workers) > 0:
+        return int(workers)
+    print(f"{COLORS['RED']}Invalid number of threads.{COLORS['RESET']}")
+    return scan_workers
+
+def partial_hash_worker(task):
+    """Process pool entry point: hash the first and last block of a file."""
+    row, file_path, size = task
+    import hashlib
+    try:
+        with open(file_path, 'rb') as file:
+            data = file.read(duplicate_block_size)
+            if size > 2 * duplicate_block_size:
+                file.seek(size - duplicate_block_size)
+            data += file.read(duplicate_block_size)
+        return row, hashlib.blake2b(data).hexdigest(), len(data), None
+    except OSError as e:
+        return row, None, 0, str(e)
+
+def full_hash_worker(task):
+    """Process pool entry point: hash a whole file."""
+    row, file_path, size = task
+    import hashlib
+    digest, bytes_read = hashlib.blake2b(), 0
+    try:
+        with open(file_path, 'rb') as file:
+            while chunk := file.read(1024 * 1024):
+                digest.update(chunk)
+                bytes_read += len(chunk)
+        return row, digest.hexdigest(), bytes_read, None
+    except OSError as e:
+        return row, None, bytes_read, str(e)
+
+def split_groups_by_hash(pool, worker, groups, table, cache, kind):
+    """
+    Hash every row of the groups and split the groups by hash, dropping rows
+    left without a match. Hashes found in the cache are reused, the others
+    are computed on the pool and stored. Returns (groups, bytes read).
+    """
+    by_hash, stats, tasks, bytes_read = {}, {}, [], 0
+    for group in groups:
+        for row in group:
+            try:
+                stats[row] = os.stat(table.path(row))
+            except OSError as e:
+                write_log(f"Could not read {table.path(row)}: {e}")
+                continue
+            digest = cache.get(stats[row], kind)
+            if digest is None:
+                tasks.append((row, table.path(row), table.sizes[row]))
+            else:
+                by_hash.setdefault((table.sizes[row], digest), []).append(row)
+
+    for row, digest, read, error in pool.imap_unordered(worker, tasks, chunksize=16):
+        bytes_read += read
+        if error:
+            write_log(f"Could not read {table.path(row)}: {error}")
+            continue
+        cache.put(stats[row], kind, digest)
+        by_hash.setdefault((table.sizes[row], digest), []).append(row)
+    return [sorted(rows) for rows in by_hash.values() if len(rows) > 1], bytes_read
+
+def distinct_files(table, rows):
+    """
+    Drop the rows that are not separate copies: symlinks (the walker follows
+    them, so they share their target's data) and further names of a file
+    that is already in rows (hardlinks, or the same file reached twice).
+    """
+    seen, kept = set(), []
+    for row in rows:
         try:
-            with open(file_path, 'r') as file:
-                try:
-                    if phrase in file.read().lower():
-                        filtered_files.append((file_path, size))
-                except UnicodeDecodeError:
-                    continue  # Skip files that cannot be decoded
-        except Exception as e:
-            print(f"Error reading {file_path}: {e}")
-
-    # Display and save the filtered files
-    for file_path, size in filtered_files:
-        size_mb = get_file_size_in_mb(size)
-        creation_time = get_file_creation_time(file_path)
-        print(f"{file_path} - {size_mb:.2f} MB - Created: {creation_time}")
-    save_results_to_file(filtered_files)
+            st = os.lstat(table.path(row))
+        except OSError:
+            continue
+        if not stat_module.S_ISREG(st.st_mode) or (st.st_dev, st.st_ino) in seen:
+            continue
+        seen.add((st.st_dev, st.st_ino))
+        kept.append(row)
+    return kept
+
+def find_duplicates(table):
+    """
+    Group the rows of the table into sets of files with identical content.
+    Files are grouped by size first, then by a hash of their first and last
+    block, and only files that still match are hashed in full, so most files
+    are never read completely. Symlinks and hardlinks are not counted as copies.
+    Hashes of unchanged files come from the hash cache. Returns (groups, bytes read).
+    """
+    import multiprocessing
+    from hash_cache import HashCache
+    by_size = {}
+    for row, size in enumerate(table.sizes):
+        if size:
+            by_size.setdefault(size, []).append(row)
+    groups = []
+    for rows in by_size.values():
+        if len(rows) > 1:
+            rows = distinct_files(table, rows)
+            if len(rows) > 1:
+                groups.append(rows)
+
+    with HashCache() as cache, multiprocessing.Pool(search_workers) as pool:
+        groups, bytes_read = split_groups_by_hash(pool, partial_hash_worker, groups, table,
+                                                  cache, f"blake2b-ends-{duplicate_block_size}")
+        # The first and last block cover small files completely
+        complete = [group for group in groups if table.sizes[group[0]] <= 2 * duplicate_block_size]
+        partial = [group for group in groups if table.sizes[group[0]] > 2 * duplicate_block_size]
+        groups, full_bytes_read = split_groups_by_hash(pool, full_hash_worker, partial, table,
+                                                       cache, "blake2b-full")
+        cache.evict_stale()
+        print(cache.summary())
+        write_log(cache.summary())
+    return complete + groups, bytes_read + full_bytes_read
+
+def list_duplicates(directory):
+    """
+    Show groups of identical files and save every copy except the first of each
+    group to a .list file, ready for list-actions.py.
+    """
+    if global_directory_path is None:
+        print(f"{COLORS['RED']}No directory path set. Please set the path first.{COLORS['RESET']}")
+        return
+
+    table = scan_directory(directory)
+    groups, bytes_read = find_duplicates(table)
+    groups.sort(key=lambda group: table.sizes[group[0]] * (len(group) - 1), reverse=True)
+
+    wasted = 0
+    with ResultWriter("list") as writer:
+        for group in groups:
+            size = table.sizes[group[0]]
+            wasted += size * (len(group) - 1)
+            print(f"{COLORS['BLUE']}{len(group)} copies of {get_file_size_in_mb(size):.2f} MB:{COLORS['RESET']}")
+            print(f"  keep: {table.path(group[0])}")
+            for row in group[1:]:
+                print(f"  copy: {table.path(row)}")
+                writer.write_row(table, row)
+
+    total = sum(table.sizes)
+    print(f"Found {COLORS['GREEN']}{len(groups)}{COLORS['RESET']} groups of duplicates, "
+          f"{COLORS['GREEN']}{get_file_size_in_mb(wasted):.2f} MB{COLORS['RESET']} in redundant copies.")
+    print(f"Read {get_file_size_in_mb(bytes_read):.2f} MB of {get_file_size_in_mb(total):.2f} MB scanned "
+          f"({bytes_read / total * 100 if total else 0:.1f}%).")
+    write_log(f"Duplicate search in {directory}: {len(groups)} groups, {wasted} bytes redundant, "
+              f"{bytes_read} of {total} bytes read")
+
+def scan_directory_sizes(directory, workers=None):
+    """
+    Return {directory: (size, file count) of the files directly inside it}
+    for a tree, through the scan index. No per-file rows are kept: changed
+    directories are summed as they are read and unchanged ones are summed by
+    the index, so memory grows with the number of directories only.
+    """
+    root = os.path.abspath(directory)
+    if live_scan is not None and live_scan.root == root:
+        return dict(live_scan.sync().directories)
+    directories = {}
+    connection = open_scan_index()
+    with log.span("walk", root=root):
+        for path, files in indexed_walk(connection, root, workers):
+            if files is None:
+                directories[path] = connection.execute(
+                    "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM files WHERE dir = ?", (os.fsencode(path),)).fetchone()
+            else:
+                directories[path] = (sum(file[1] for file in files), len(files))
+        connection.commit()
+        connection.close()
+    return directories
+
+def directory_totals(directories):
+    """
+    Roll per-directory totals, {directory: (size, file count)} as returned by
+    scan_directory_sizes, up the tree.
+    Returns (totals, children): totals maps each directory to the
+    (size, file count) of its whole subtree, children maps each directory
+    to its subdirectories. Both hold one entry per directory, not per file.
+    """
+    totals = {path: list(direct) for path, direct in directories.items()}
+    children = {}
+    # Deepest directories first, so every subtree is complete before it is added to its parent
+    for path in sorted(totals, key=lambda path: path.count(os.sep), reverse=True):
+        parent = os.path.dirname(path)
+        if parent in totals and parent != path:
+            totals[parent][0] += totals[path][0]
+            totals[parent][1] += totals[path][1]
+            children.setdefault(parent, []).append(path)
+    return totals, children
+
+def directory_size_report(directory, top_count=20):
+    """Show the heaviest subdirectories of the mounted path and let the user drill down into them."""
+    if global_directory_path is None:
+        print(f"{COLORS['RED']}No directory path set. Please set the path first.{COLORS['RESET']}")
+        return
+
+    totals, children = directory_totals(scan_directory_sizes(directory))
+    current = os.path.abspath(directory)
+    while True:
+        size, count = totals[current]
+        print(f"{COLORS['BLUE']}{current}{COLORS['RESET']} - {get_file_size_in_mb(size):.2f} MB in {count} files")
+        heaviest = sorted(children.get(current, []), key=lambda path: totals[path][0], reverse=True)[:top_count]
+        for i, path in enumerate(heaviest, 1):
+            size, count = totals[path]
+            print(f"{COLORS['GREEN']}({i}){COLORS['RESET']} {get_file_size_in_mb(size):10.2f} MB "
+                  f"{count:8} files  {os.path.basename(path)}")
+        choice = input("Enter a number to open, '..' to go up or leave blank to go back: ").strip()
+        if not choice:
+            return
+        elif choice == '..':
+            if current != os.path.abspath(directory):
+                current = os.path.dirname(current)
+        elif choice.isdigit() and 1 <= int(choice) <= len(heaviest):
+            current = heaviest[int(choice) - 1]
+        else:
+            print(f"{COLORS['RED']}Invalid choice. Please try again.{COLORS['RESET']}")
+
+def parse_patterns(text):
+    """Split comma separated glob patterns, raising ValueError for one that cannot be compiled."""
+    import re
+    patterns = [pattern.strip() for pattern in text.split(',') if pattern.strip()]
+    for pattern in patterns:
+        try:
+            re.compile(glob_to_regex(pattern)[0])
+        except re.error as e:
+            raise ValueError(f"invalid pattern {pattern}: {e}")
+    return patterns
+
+def get_patterns(kind, current):
+    """Ask the user for exclude or include patterns; invalid input keeps the current ones."""
+    text = input(f"Enter {kind} patterns separated by commas, e.g. .git/, node_modules/, *.tmp "
+                 f"(leave blank for none): ")
+    try:
+        return parse_patterns(text)
+    except ValueError as e:
+        print(f"{COLORS['RED']}{e}{COLORS['RESET']}")
+        return current
+
+def scan_rules_menu():
+    """Display and change the exclude/include rules applied while scanning."""
+    global scan_excludes, scan_includes, one_filesystem
+    while True:
+        print(f"Exclude: {COLORS['GREEN']}{', '.join(scan_excludes) or '-'}{COLORS['RESET']}")
+        print(f"Include: {COLORS['GREEN']}{', '.join(scan_includes) or '-'}{COLORS['RESET']}")
+        print(f"Stay on one filesystem: {COLORS['GREEN']}{'yes' if one_filesystem else 'no'}{COLORS['RESET']}")
+        print(f"{COLORS['GREEN']}(1){COLORS['RESET']} Set exclude patterns")
+        print(f"{COLORS['GREEN']}(2){COLORS['RESET']} Set include patterns (files only)")
+        print(f"{COLORS['GREEN']}(3){COLORS['RESET']} Toggle stay on one filesystem")
+        print(f"{COLORS['GREEN']}(4){COLORS['RESET']} Back")
+        choice = input("Choice (1/2/3/4): ").strip()
+
+        if choice == '1':
+            scan_excludes = get_patterns("exclude", scan_excludes)
+        elif choice == '2':
+            scan_includes = get_patterns("include", scan_includes)
+        elif choice == '3':
+            one_filesystem = not one_filesystem
+        elif choice == '4':
+            return
+        else:
+            print(f"{COLORS['RED']}Invalid choice. Please try again.{COLORS['RESET']}")
+            continue
+        write_log(f"Scan rules: exclude {scan_excludes}, include {scan_includes}, one filesystem {one_filesystem}")
+        # The live table was built with the old rules
+        if live_scan is not None:
+            stop_live_mode()
+            start_live_mode(global_directory_path)
 
 def path_to_dir_menu():
     
     """Display and manage submenu 'Path to dir'."""
     
-    global global_directory_path
+    global global_directory_path, scan_workers
     while True:
         print(f"PATH MOUNTED: {COLORS['GREEN']}{global_directory_path}{COLORS['RESET']}")
         print(f"{COLORS['GREEN']}(1){COLORS['RESET']} Enter path")
         print(f"{COLORS['GREEN']}(2){COLORS['RESET']} Unmount path")
         print(f"{COLORS['GREEN']}(3){COLORS['RESET']} Back")
-        choice = input("Wybór (1/2/3): ").strip()
+        print(f"{COLORS['GREEN']}(4){COLORS['RESET']} Set scanner threads")
+        print(f"{COLORS['GREEN']}(5){COLORS['RESET']} Live mode: {'on' if live_scan else 'off'}")
+        print(f"{COLORS['GREEN']}(6){COLORS['RESET']} Exclude/include rules")
+        print(f"{COLORS['GREEN']}(7){COLORS['RESET']} Rescan ignoring index")
+        choice = input("Wybór (1/2/3/4/5/6/7): ").strip()
 
         if choice == '1':
+            stop_live_mode()
             global_directory_path = get_directory_path()
             print(f"Selected path: {global_directory_path}")
         elif choice == '2':
+            stop_live_mode()
             global_directory_path = None
             print(f"{COLORS['RED']}Path unmounted{COLORS['RESET']}")
         elif choice == '3':
             return
+        elif choice == '4':
+            scan_workers = get_scan_workers()
+            write_log(f"Scanner threads set to {scan_workers}")
+        elif choice == '5':
+            if live_scan is not None:
+                stop_live_mode()
+                print("Live mode off")
+            elif global_directory_path is None:
+                print(f"{COLORS['RED']}No directory path set. Please set the path first.{COLORS['RESET']}")
+            else:
+                start_live_mode(global_directory_path)
+        elif choice == '6':
+            scan_rules_menu()
+        elif choice == '7':
+            rescan_directory(global_directory_path)
         else:
             print(f"{COLORS['RED']}Invalid choice. Please try again.{COLORS['RESET']}")
 
@@ -528,6 +1930,10 @@ def display_main_menu():
         "List files by alphabetical order",
         "List files containing phrase in name",
         "List files containing phrase in content",
+        "Find duplicate files",
+        "Directory size report",
+        "Build/update content index",
+        "Result file format",
         "Actions on list",
         "Exit"
     ]
@@ -540,6 +1946,7 @@ def display_main_menu():
 
 def handle_menu_choice(choice):
     """Handle the user's menu choice."""
+    global output_format
     write_log(f"User selected menu choice: {choice}")
     directory = global_directory_path
     if choice == '1':
@@ -555,9 +1962,19 @@ def handle_menu_choice(choice):
     elif choice == '6':
         list_by_phrase_in_content(directory)
     elif choice == '7':
+        list_duplicates(directory)
+    elif choice == '8':
+        directory_size_report(directory)
+    elif choice == '9':
+        build_content_index(directory)
+    elif choice == '10':
+        output_format = get_output_format()
+        write_log(f"Result file format set to {output_format}")
+    elif choice == '11':
+        import subprocess
         subprocess.run([sys.executable, 'list-actions.py'])
         sys.exit()
-    elif choice == '8':
+    elif choice == '12':
         finalize_and_exit()
     else:
         write_log(f"Invalid choice: {choice}")
@@ -574,7 +1991,110 @@ def main():
         write_log(f"User entered choice: {choice}")
         handle_menu_choice(choice)
 
+def parse_batch_arguments(argv):
+    """Parse the command line of a batch run."""
+    import argparse
+
+    def date(value):
+        return datetime.datetime.strptime(value, "%Y-%m-%d")
+
+    parser = argparse.ArgumentParser(
+        prog="list-files.py",
+        description="List files below a directory without the interactive menu and stream them to stdout.")
+    parser.add_argument("path", help="directory to scan, or a binary result list (.blist) to filter and sort again")
+    parser.add_argument("--sort", default="name",
+                        help="comma separated sort keys from size, date, extension, name; "
+                             "append :asc or :desc to a key to override --order (default: name)")
+    parser.add_argument("--order", choices=["asc", "desc"], default="asc", help="default sort order")
+    parser.add_argument("--since", type=date, help="only files modified on or after YYYY-MM-DD")
+    parser.add_argument("--until", type=date, help="only files modified on or before YYYY-MM-DD")
+    parser.add_argument("--extension", help="only files ending with this extension, e.g. .txt")
+    parser.add_argument("--size", type=parse_size_filter, help="size filter in MB, e.g. '>50' or '<100'")
+    parser.add_argument("--name", help="only files whose name contains this phrase")
+    parser.add_argument("--content", help="only files containing this phrase; matches are written as they are found")
+    parser.add_argument("--top", type=int, help="only the first N files; keeps N files in memory "
+                                                "instead of sorting all (first sort key must be size or date)")
+    parser.add_argument("--format", choices=list(OUTPUT_FORMATS), default="list", help="output format (default: list)")
+    parser.add_argument("--workers", type=int, help="number of scanner threads")
+    parser.add_argument("--rescan", action="store_true",
+                        help="read every directory again instead of trusting the scan index; picks up files "
+                             "rewritten in place, which do not change their directory's mtime")
+    parser.add_argument("--exclude", action="append", default=[], metavar="PATTERN",
+                        help="do not scan files or directories matching this gitignore-style pattern, "
+                             "e.g. .git/ or '*.tmp'; may be repeated or comma separated")
+    parser.add_argument("--include", action="append", default=[], metavar="PATTERN",
+                        help="only list files matching this pattern; may be repeated or comma separated")
+    parser.add_argument("--one-file-system", "-x", action="store_true",
+                        help="do not descend into directories on other filesystems")
+    args = parser.parse_args(argv)
+    if args.until:
+        # The query engine's end bound is exclusive: stop at the midnight after the given day
+        args.until += datetime.timedelta(days=1)
+    args.from_list = os.path.isfile(args.path) and is_list_file(args.path)
+    if not os.path.isdir(args.path) and not args.from_list:
+        parser.error(f"not a directory or binary result list: {args.path}")
+    try:
+        args.exclude = parse_patterns(','.join(args.exclude))
+        args.include = parse_patterns(','.join(args.include))
+    except ValueError as e:
+        parser.error(str(e))
+
+    args.order_by = []
+    for key in args.sort.split(','):
+        key, _, order = key.strip().partition(':')
+        if key not in ('size', 'date', 'extension', 'name') or order not in ('', 'asc', 'desc'):
+            parser.error(f"invalid sort key: {key}{':' if order else ''}{order}")
+        args.order_by.append((key, (order or args.order) == 'asc'))
+    if args.top is not None:
+        if args.top < 1 or args.order_by[0][0] not in ('size', 'date') or args.content:
+            parser.error("--top needs a positive count, size or date as the first sort key and no --content")
+    return args
+
+def run_batch(argv):
+    """Run one listing from command line arguments, without menus or a log file."""
+    global log_file_name, scan_excludes, scan_includes, one_filesystem
+    log_file_name = None
+    args = parse_batch_arguments(argv)
+    scan_excludes, scan_includes, one_filesystem = args.exclude, args.include, args.one_file_system
+    size_operator, size_limit = args.size or (None, None)
+
+    if args.top:
+        matches = record_filter(args.since, args.until, args.extension, size_operator, size_limit)
+        records = (list_file_records(args.path) if args.from_list
+                   else iter_scanned_files(args.path, args.workers, args.rescan))
+        records = filter(matches, records)
+        if args.name:
+            phrase = args.name.lower()
+            records = (record for record in records if phrase in os.path.basename(record[0]).lower())
+        key, ascending = args.order_by[0]
+        table = FileTable()
+        for record in top_files(records, args.top, key, largest=not ascending):
+            table.add(*record)
+        rows = range(len(table))
+        args.name = None
+    else:
+        table = (load_list_file(args.path) if args.from_list
+                 else scan_directory(args.path, args.workers, full_rescan=args.rescan))
+        rows = query_files(table, args.since, args.until, args.extension, size_operator, size_limit, args.order_by)
+    if args.name:
+        named = set(table.find_by_name(args.name))
+        rows = [row for row in rows if row in named]
+    if args.content:
+        rows = search_content(table, rows, args.content)
+
+    writer = ResultWriter(args.format, stream=sys.stdout.buffer)
+    try:
+        for row in rows:
+            writer.write_row(table, row)
+        writer.close()
+    except BrokenPipeError:
+        # The reader went away (e.g. `| head`); stop quietly
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    return 0
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(run_batch(sys.argv[1:]))
     initialize_log_file()
     write_log("Script started")
     start()
@@ -0,0 +1,155 @@
+"""
+Binary .blist result lists shared by list-files.py and list-actions.py.
+
+Layout (little endian):
+
+    header    b"LFLS", version (u16), reserved (u16)
+    strings   the encoded paths, back to back
+    padding   up to a multiple of 8 bytes
+    columns   offset (u64), size (i64), mtime (f64), ctime (f64), inode (u64)
+              and path length (u32), each one value per record
+    footer    record count (u64), strings size (u64), version (u16),
+              reserved (u16), b"LFLS"
+
+The footer comes last so the file can be written in one pass, even to a pipe:
+paths are streamed as they arrive and only the fixed-width columns are kept
+in memory until close(). Opening a list maps the file and reads the footer,
+so it takes the same time for any number of records; paths are decoded only
+when asked for.
+"""
+import mmap
+import struct
+import sys
+from array import array
+
+MAGIC = b"LFLS"
+VERSION = 1
+EXTENSION = ".blist"
+HEADER = struct.Struct("<4sHH")
+FOOTER = struct.Struct("<QQHH4s")
+# (name, array type code) in file order; 8-byte columns first keep them aligned
+COLUMNS = (("offsets", "Q"), ("sizes", "q"), ("mtimes", "d"), ("ctimes", "d"), ("inodes", "Q"), ("lengths", "I"))
+
+_encoding = sys.getfilesystemencoding()
+_errors = sys.getfilesystemencodeerrors()
+
+
+def is_list_file(file_name):
+    """True if the file starts like a binary list."""
+    try:
+        with open(file_name, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class ListWriter:
+    """Write records into an open binary file object; close() finishes the list but not the file."""
+
+    def __init__(self, file):
+        self.file = file
+        self.columns = {name: array(code) for name, code in COLUMNS}
+        self.strings_size = 0
+        self.bytes_written = HEADER.size
+        file.write(HEADER.pack(MAGIC, VERSION, 0))
+
+    def __len__(self):
+        return len(self.columns["sizes"])
+
+    def add(self, path, size, mtime, ctime, inode=0):
+        encoded = path.encode(_encoding, _errors)
+        self.file.write(encoded)
+        columns = self.columns
+        columns["offsets"].append(self.strings_size)
+        columns["lengths"].append(len(encoded))
+        columns["sizes"].append(size)
+        columns["mtimes"].append(mtime)
+        columns["ctimes"].append(ctime)
+        columns["inodes"].append(inode)
+        self.strings_size += len(encoded)
+        self.bytes_written += len(encoded)
+
+    def close(self):
+        padding = -(HEADER.size + self.strings_size) % 8
+        self.file.write(b"\0" * padding)
+        self.bytes_written += padding
+        for name, _ in COLUMNS:
+            column = self.columns[name]
+            if sys.byteorder == "big":
+                column.byteswap()
+            data = column.tobytes()
+            self.file.write(data)
+            self.bytes_written += len(data)
+        self.file.write(FOOTER.pack(len(self), self.strings_size, VERSION, 0, MAGIC))
+        self.bytes_written += FOOTER.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ListReader:
+    """
+    Memory-mapped view of a binary list. Columns (sizes, mtimes, ctimes,
+    inodes) are indexable by record number without copying.
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        with open(file_name, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._data = data = memoryview(self._map)
+        if len(data) < HEADER.size + FOOTER.size:
+            raise ValueError(f"{file_name} is not a binary list file")
+        magic, version, _ = HEADER.unpack_from(data, 0)
+        count, strings_size, footer_version, _, footer_magic = FOOTER.unpack_from(data, len(data) - FOOTER.size)
+        if magic != MAGIC or footer_magic != MAGIC:
+            raise ValueError(f"{file_name} is not a binary list file")
+        if version != VERSION or footer_version != VERSION:
+            raise ValueError(f"{file_name} has list format version {version}, only {VERSION} is supported")
+        self._strings = data[HEADER.size:HEADER.size + strings_size]
+        offset = HEADER.size + strings_size + (-(HEADER.size + strings_size) % 8)
+        for name, code in COLUMNS:
+            width = struct.calcsize(code)
+            column = data[offset:offset + count * width].cast(code)
+            if sys.byteorder == "big":
+                column = array(code, column)
+                column.byteswap()
+            setattr(self, name, column)
+            offset += count * width
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def path(self, index):
+        start = self.offsets[index]
+        return bytes(self._strings[start:start + self.lengths[index]]).decode(_encoding, _errors)
+
+    def record(self, index):
+        """Return (path, size, mtime, ctime, inode) of one record."""
+        return self.path(index), self.sizes[index], self.mtimes[index], self.ctimes[index], self.inodes[index]
+
+    def paths(self):
+        return map(self.path, range(self.count))
+
+    def __iter__(self):
+        return map(self.record, range(self.count))
+
+    def close(self):
+        # Views into the map must be released before it can be closed
+        for name, _ in COLUMNS:
+            column = getattr(self, name)
+            if isinstance(column, memoryview):
+                column.release()
+        self._strings.release()
+        self._data.release()
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,94 @@
+"""
+Buffered JSON-lines log shared by the List-files tools.
+
+Messages are queued and written by a background thread, so logging a
+message costs a queue put instead of opening the log file. Timing spans
+are summed per phase (walk, stat, filter, sort, render, action) and
+summarised by profile_summary() at exit.
+"""
+import datetime
+import json
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StructuredLog:
+    """
+    Write events as JSON objects, one per line. Without a file name events are
+    dropped, but spans are still timed so the profile summary works.
+    """
+
+    def __init__(self, file_name=None):
+        self.file_name = file_name
+        self.phases = {}  # phase -> [count, total seconds]
+        self._lock = threading.Lock()
+        self._queue = None
+        self._writer = None
+        if file_name is not None:
+            self._queue = queue.Queue()
+            self._writer = threading.Thread(target=self._write_events, daemon=True)
+            self._writer.start()
+
+    def _write_events(self):
+        """Background thread: serialise queued events and write them in large blocks."""
+        with open(self.file_name, 'a', buffering=64 * 1024) as log_file:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                timestamp, fields = item
+                fields = {"time": datetime.datetime.fromtimestamp(timestamp).isoformat(timespec="milliseconds"),
+                          **fields}
+                log_file.write(json.dumps(fields, default=str) + '\n')
+                # Flush once the burst is over, not after every event
+                if self._queue.empty():
+                    log_file.flush()
+
+    def event(self, event, **fields):
+        """Queue one event, e.g. log.event("copy", source=path)."""
+        if self._queue is not None:
+            self._queue.put((time.time(), {"event": event, **fields}))
+
+    def message(self, message):
+        """Queue a plain text message."""
+        self.event("message", message=message)
+
+    def add_time(self, phase, seconds):
+        with self._lock:
+            totals = self.phases.setdefault(phase, [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+
+    @contextmanager
+    def span(self, phase, quiet=False, **fields):
+        """
+        Time a block of code as one occurrence of a phase. Unless quiet, the
+        duration is also logged; use quiet for spans repeated per directory or file.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.add_time(phase, seconds)
+            if not quiet:
+                self.event("span", phase=phase, seconds=round(seconds, 6), **fields)
+
+    def profile_summary(self):
+        """Return the time spent per phase as printable lines, slowest phase first."""
+        with self._lock:
+            phases = sorted(self.phases.items(), key=lambda item: item[1][1], reverse=True)
+        lines = [f"{'phase':<10}{'count':>10}{'total s':>12}{'mean ms':>12}"]
+        for phase, (count, total) in phases:
+            lines.append(f"{phase:<10}{count:>10}{total:>12.3f}{total / count * 1000:>12.3f}")
+        return lines
+
+    def close(self):
+        """Write the remaining events and stop the writer thread."""
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+            self._queue = None